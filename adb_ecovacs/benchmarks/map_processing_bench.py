@@ -0,0 +1,65 @@
+"""
+Compare the legacy and fast map processing pipelines on recorded screenshots.
+
+Record full-screen captures of the Robot page first, e.g.
+``python -m uiautomator2 screenshot robot_01.png``, then run:
+
+    python adb_ecovacs/benchmarks/map_processing_bench.py robot_*.png --repeat 20
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from PIL import Image, ImageChops
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ecovacs.map_processing import PIPELINES  # noqa: E402
+
+
+def _time(func, img, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        frame = img.copy()
+        started = perf_counter()
+        result = func(frame)
+        timings.append(perf_counter() - started)
+    return result, timings
+
+
+def _diff_ratio(a, b):
+    """Fraction of pixels whose RGBA value differs noticeably between two outputs."""
+    if a.size != b.size:
+        return 1.0
+    diff = ImageChops.difference(a, b).convert("L")
+    changed = sum(diff.histogram()[16:])
+    return changed / float(a.size[0] * a.size[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("screenshots", nargs="+", help="recorded full-screen PNG captures")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    totals = {name: [] for name in PIPELINES}
+    for path in args.screenshots:
+        img = Image.open(path)
+        img.load()
+        outputs = {}
+        for name, func in PIPELINES.items():
+            outputs[name], timings = _time(func, img, args.repeat)
+            totals[name].extend(timings)
+            print(f"{Path(path).name:30} {name:7} median {statistics.median(timings) * 1000:7.1f} ms")
+        print(f"{'':30} differing pixels {_diff_ratio(outputs['legacy'], outputs['fast']):.2%}")
+
+    legacy = statistics.median(totals["legacy"])
+    fast = statistics.median(totals["fast"])
+    print(f"\nOverall median: legacy {legacy * 1000:.1f} ms, fast {fast * 1000:.1f} ms ({legacy / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
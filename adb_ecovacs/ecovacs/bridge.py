@@ -0,0 +1,263 @@
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .command_queue import PRIORITY_FOLLOWUP, CommandQueue
+from .device import DeviceController
+from .entity_cache import EntityInventory
+from .map_utils import UPLOAD_MODE_MQTT, MapManager
+from .mqtt_entities import MqttContext, MqttEntity
+from .nav_costs import TransitionCostModel
+from .navigation import Navigator
+from .rooms import RoomManager
+
+# HA button entity name -> RobotBridge method. The names are the entity names
+# (and unique ids) Home Assistant already knows, so they must not change.
+BUTTON_ACTIONS = {
+    "ClickPause": "click_pause",
+    "ClickEnd": "click_end",
+    "ClickStart": "click_start",
+    "ClickZone": "click_zone",
+    "ClickNora": "click_nora",
+    "ClickPostMeal": "click_post_meal",
+    "ClickStopDryMop": "click_stop_dry_mop",
+}
+
+
+class RobotBridge:
+    """One phone/robot: device stack, serialized command worker, entities and command routing."""
+
+    def __init__(
+        self,
+        device: DeviceController,
+        name: str,
+        password: str,
+        ha_prefix: str,
+        namespace: str = "",
+        nav_cost_path: Optional[str] = None,
+        post_command_quiet_window: float = 1.5,
+        entity_cache_path: Optional[str] = None,
+    ):
+        self.name = name
+        self.namespace = namespace
+        self.device = device
+        self.command_queue = CommandQueue()
+        self.navigator = Navigator(device, password, TransitionCostModel(nav_cost_path))
+        self.device_info = {
+            "identifiers": [name.lower().replace(" ", "_")],
+            "name": name,
+            "manufacturer": "PythonMQTT",
+            "model": "Robot Vacuum",
+        }
+        self.mqtt_context = MqttContext(device_info=self.device_info, ha_prefix=ha_prefix, namespace=namespace)
+        self.rooms = RoomManager(device, self.navigator, self.mqtt_context, EntityInventory(entity_cache_path))
+        self.rooms.on_entity_added = self.register_entity
+        image_name = f"Map_cropped_{namespace}.png" if namespace else "Map_cropped.png"
+        self.maps = MapManager(
+            device,
+            self.navigator,
+            self.command_queue.queue_task,
+            image_name=image_name,
+            pending_tasks=self.command_queue.pending,
+        )
+        self.post_command_quiet_window = post_command_quiet_window
+
+        self.entities: List[MqttEntity] = []
+        self.map_status_entity: Optional[MqttEntity] = None
+        # command topic -> (entity, handler(entity, payload)); filled by register_entity().
+        self.command_handlers: Dict[str, Tuple[MqttEntity, Callable[[MqttEntity, str], None]]] = {}
+        # Called with (bridge, topic) for every new command topic, e.g. to subscribe it.
+        self.on_topic_added: Optional[Callable[["RobotBridge", str], None]] = None
+        # Set when entities came from the cache and still need checking against the phone.
+        self.reconcile_pending = False
+
+    def queue_task(self, func, *args, **kwargs):
+        return self.command_queue.queue_task(func, *args, **kwargs)
+
+    # --------------------------
+    # Button actions
+    # --------------------------
+    def click_pause(self):
+        self.navigator.navigate_to("Robot")
+        self.device.refresh_tree()
+        self.device.click_elem(self.device.find_by_text("Pause"))
+
+    def click_end(self):
+        self.navigator.navigate_to("Robot")
+        self.device.refresh_tree()
+        self.device.click_elem(self.device.find_by_text("End"))
+
+    def click_start(self):
+        self.navigator.navigate_to("Robot")
+        self.device.refresh_tree()
+        start = self.device.find_by_text("Start")
+        if start is None:
+            start = self.device.find_by_text("Continue")
+        print("Start button:", start.attrib.get("text", "") if start is not None else "")
+        self.device.click_elem(start)
+
+    def click_zone(self):
+        self.navigator.navigate_to("Robot")
+        self.device.refresh_tree()
+        self.device.click_elem(self.device.find_by_text("Zone"))
+        zone_elem = self.device.find_by_text("1.0m * 1.0m")
+        if zone_elem is not None:
+            children = list(zone_elem.iterfind("../*"))
+            print(f"Found {len(children)} child elements")
+        else:
+            print('Object "1.0m * 1.0m" not found.')
+
+    def click_nora(self):
+        self.navigator.navigate_to("Scenario")
+        self.device.click_elem(self.device.find_by_text("Nora"))
+
+    def click_post_meal(self):
+        self.navigator.navigate_to("Scenario")
+        self.device.clear_tree()
+        self.device.click_elem(self.device.find_by_desc("Post-meal Clean"))
+
+    def click_stop_dry_mop(self):
+        self.navigator.navigate_to("Station")
+        cancel = self.device.find_by_text("Cancel")
+        if cancel is not None:
+            bounds = cancel.attrib["bounds"]
+            x1, y1, x2, y2 = map(int, bounds.replace("[", "").replace("]", " ").replace(",", " ").split())
+            x, y = (x1 + x2) / 2, y1 - 100
+            self.device.device.click(x, y)
+            self.device.clear_tree()
+
+    # --------------------------
+    # Entities
+    # --------------------------
+    def create_entities(self, client):
+        """Build room switches, sensors and buttons for this robot and register their topics."""
+        self.mqtt_context.client = client
+        ha_prefix = self.mqtt_context.ha_prefix
+        namespace = self.namespace
+        cached = self.rooms.cached_entities()
+        if cached:
+            print(f"📦 [{self.name}] Restored {len(cached)} rooms from the entity cache")
+            self.entities = cached
+            self.reconcile_pending = True
+        else:
+            self.entities = self.rooms.refresh_room_state()
+
+        self.map_status_entity = MqttEntity(client, self.device_info, "Map Status", "sensor", ha_prefix, namespace=namespace)
+        self.entities.append(self.map_status_entity)
+        self.maps.set_status_entity(self.map_status_entity)
+        map_unchanged_entity = MqttEntity(client, self.device_info, "Map Unchanged", "sensor", ha_prefix, namespace=namespace)
+        self.entities.append(map_unchanged_entity)
+        self.maps.set_unchanged_entity(map_unchanged_entity)
+        if self.maps.upload_mode == UPLOAD_MODE_MQTT:
+            map_image_entity = MqttEntity(client, self.device_info, "Map", "image", ha_prefix, namespace=namespace)
+            self.entities.append(map_image_entity)
+            self.maps.set_image_entity(map_image_entity)
+        self.entities.append(MqttEntity(client, self.device_info, "Room Selection", "text", ha_prefix, namespace=namespace))
+        for name in BUTTON_ACTIONS:
+            self.entities.append(MqttEntity(client, self.device_info, name, "button", ha_prefix, namespace=namespace))
+
+        for entity in self.entities:
+            self.register_entity(entity)
+
+    def discovery_messages(self):
+        return [message for entity in self.entities for message in entity.discovery_messages()]
+
+    def _resolve_handler(self, entity):
+        if entity.entity_type == "switch":
+            return self.handle_switch
+        if entity.entity_type == "text":
+            return self.apply_room_selection
+        if entity.entity_type == "button":
+            action = getattr(self, BUTTON_ACTIONS.get(entity.name, ""), None)
+            if not callable(action):
+                print(f"⚠️ No handler found for {entity.name}")
+                return None
+
+            def handle_button(entity, payload):
+                print(f"⚙️ Button press {entity.name}")
+                action()
+
+            return handle_button
+        return None
+
+    def register_entity(self, entity):
+        """Add an entity's command topic to the dispatch table and announce it."""
+        if not entity.command_topic or entity.command_topic in self.command_handlers:
+            return
+        handler = self._resolve_handler(entity)
+        if handler is None:
+            return
+        self.command_handlers[entity.command_topic] = (entity, handler)
+        if self.on_topic_added is not None:
+            self.on_topic_added(self, entity.command_topic)
+
+    # --------------------------
+    # Command handling (runs on this robot's worker thread)
+    # --------------------------
+    def handle_message(self, topic, payload):
+        # Latest command per topic wins while it is still waiting for the device.
+        self.queue_task(self.mqtt_received, topic, payload, key=("command", topic))
+
+    def handle_switch(self, entity, payload):
+        decoded_payload = payload.upper()
+        desired_state = decoded_payload == "ON"
+        if entity.enabled != desired_state:
+            print(f"⚙️ Switch {entity.android_name} toggled {decoded_payload} (was {entity.enabled})")
+            self.rooms.enable_room(entity.android_name)
+            self.rooms.wait_for_room_state(entity.android_name, desired_state, retries=10, delay=0.5)
+        else:
+            print(f"ℹ️ {entity.android_name} already {decoded_payload}")
+
+    def apply_room_selection(self, entity, payload):
+        known_rooms = [e.android_name for e in self.entities if e.entity_type == "switch"]
+        try:
+            desired = self.rooms.parse_room_selection(payload, known_rooms)
+        except ValueError as exc:
+            print(f"⚠️ Invalid room selection payload {payload!r}: {exc}")
+            return
+        print(f"⚙️ Room selection -> {desired}")
+        if not self.rooms.set_rooms(desired):
+            # Partly applied or unconfirmed: bring the room switches back in line with the phone.
+            self.rooms.refresh_room_state(self.entities)
+        selected = self.rooms.selected_rooms()
+        if selected is None:
+            print("⚠️ Map not visible; room selection state not published")
+            return
+        entity.publish_state(json.dumps(selected))
+
+    def mqtt_received(self, topic, payload):
+        print(f"📩 [{self.name}] Received '{payload.upper()}' on {topic}")
+        route = self.command_handlers.get(topic)
+        if route is None:
+            print(f"⚠️ No entity matched topic {topic}")
+            return
+
+        entity, handler = route
+        handler(entity, payload)
+        # A command usually starts or stops the robot; look at the map often for a while.
+        self.maps.scheduler.boost(f"command on {entity.name}")
+
+        # Debounced: a burst of commands ends in a single refresh + screenshot.
+        self.queue_task(
+            self.post_command_finalize,
+            priority=PRIORITY_FOLLOWUP,
+            key="post_command_finalize",
+            delay=self.post_command_quiet_window,
+        )
+
+    def reconcile_entities(self):
+        """Check cached room entities against the live UI (adds new rooms, fixes states)."""
+        self.rooms.refresh_room_state(self.entities)
+        self.reconcile_pending = False
+        print(f"✅ [{self.name}] Entities reconciled with the phone")
+
+    def post_command_finalize(self):
+        self.rooms.refresh_room_state(self.entities)
+        self.maps.map_screenshot()
+        print("🔄 Room state refreshed after command processing.")
+
+    def start(self):
+        self.command_queue.start_worker()
+        if self.reconcile_pending:
+            self.queue_task(self.reconcile_entities, priority=PRIORITY_FOLLOWUP, key="reconcile_entities")
+        self.maps.start_refresh_loop()
+        self.maps.start_status_poll()
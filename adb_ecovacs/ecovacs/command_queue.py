@@ -1,29 +1,184 @@
-import queue
+import heapq
+import itertools
 import threading
+from time import monotonic
+from typing import Dict, Hashable, List, Optional, Tuple
+
+PRIORITY_USER = 0
+PRIORITY_FOLLOWUP = 10
+PRIORITY_PERIODIC = 20
+
+_PENDING = "pending"
+_RUNNING = "running"
+_DONE = "done"
+_CANCELLED = "cancelled"
+
+
+class ScheduledTask:
+    """Handle for a queued task; ``cancel()`` drops it if it has not started yet."""
+
+    def __init__(
+        self,
+        queue: "CommandQueue",
+        func,
+        args,
+        kwargs,
+        priority: int,
+        key: Optional[Hashable],
+        deadline: Optional[float],
+        not_before: float,
+    ):
+        self._queue = queue
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.key = key
+        self.deadline = deadline
+        self.not_before = not_before
+        self.state = _PENDING
+
+    @property
+    def name(self) -> str:
+        return getattr(self.func, "__name__", repr(self.func))
+
+    def cancel(self) -> bool:
+        return self._queue.cancel(self)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.state == _CANCELLED
+
+    @property
+    def done(self) -> bool:
+        return self.state in (_DONE, _CANCELLED)
 
 
 class CommandQueue:
-    """Serializes UI-related tasks to avoid concurrent device actions."""
+    """
+    Serializes UI-related tasks to avoid concurrent device actions.
+
+    Tasks run one at a time on a single worker thread, lowest ``priority`` first and
+    FIFO within a priority. A task queued with a ``key`` that is already pending
+    replaces the pending task's callable and arguments (latest wins) and keeps the
+    better of the two priorities, so duplicate refreshes collapse into one run.
+    ``expires_in`` drops a task that has not started within that many seconds.
+    ``delay`` holds a task back for that many seconds; re-queuing the same key
+    restarts the delay, which turns keyed tasks into debounced ones.
+    """
 
     def __init__(self):
-        self.command_queue = queue.Queue()
+        self._heap: List[Tuple[int, int, ScheduledTask]] = []
+        self._pending_by_key: Dict[Hashable, ScheduledTask] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+
+    def queue_task(
+        self,
+        func,
+        *args,
+        priority: int = PRIORITY_USER,
+        key: Optional[Hashable] = None,
+        expires_in: Optional[float] = None,
+        delay: float = 0.0,
+        **kwargs,
+    ) -> ScheduledTask:
+        now = monotonic()
+        deadline = now + expires_in if expires_in is not None else None
+        not_before = now + delay
+        with self._cond:
+            existing = self._pending_by_key.get(key) if key is not None else None
+            if existing is not None and existing.state == _PENDING:
+                existing.func, existing.args, existing.kwargs = func, args, kwargs
+                existing.deadline = deadline
+                existing.not_before = not_before
+                if priority < existing.priority:
+                    existing.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), existing))
+                print(f"🔁 Coalesced task {existing.name} (key={key})")
+                return existing
+            task = ScheduledTask(self, func, args, kwargs, priority, key, deadline, not_before)
+            if key is not None:
+                self._pending_by_key[key] = task
+            heapq.heappush(self._heap, (priority, next(self._seq), task))
+            self._cond.notify()
+            return task
+
+    def cancel(self, task: ScheduledTask) -> bool:
+        with self._cond:
+            if task.state != _PENDING:
+                return False
+            task.state = _CANCELLED
+            self._forget_key(task)
+            return True
 
-    def queue_task(self, func, *args, **kwargs):
-        def _task():
-            func(*args, **kwargs)
+    def pending(self, min_priority: Optional[int] = None, max_priority: Optional[int] = None) -> int:
+        """Number of pending tasks, optionally restricted to a priority range."""
+        with self._cond:
+            return sum(
+                1
+                for task in self._live_tasks()
+                if (min_priority is None or task.priority >= min_priority)
+                and (max_priority is None or task.priority <= max_priority)
+            )
 
-        self.command_queue.put(_task)
+    def _live_tasks(self):
+        seen = set()
+        for _, _, task in self._heap:
+            if task.state == _PENDING and id(task) not in seen:
+                seen.add(id(task))
+                yield task
+
+    def _forget_key(self, task: ScheduledTask):
+        if task.key is not None and self._pending_by_key.get(task.key) is task:
+            del self._pending_by_key[task.key]
+
+    def _next_task(self) -> ScheduledTask:
+        with self._cond:
+            while True:
+                deferred = []
+                chosen = None
+                now = monotonic()
+                while self._heap:
+                    entry = heapq.heappop(self._heap)
+                    priority, _, task = entry
+                    # Stale heap entries remain after a priority upgrade or cancellation.
+                    if task.state != _PENDING or priority != task.priority:
+                        continue
+                    if task.deadline is not None and now > task.deadline:
+                        task.state = _CANCELLED
+                        self._forget_key(task)
+                        print(f"⌛ Dropping expired task {task.name}")
+                        continue
+                    if task.not_before > now:
+                        deferred.append(entry)
+                        continue
+                    chosen = task
+                    break
+                for entry in deferred:
+                    heapq.heappush(self._heap, entry)
+                if chosen is not None:
+                    self._forget_key(chosen)
+                    chosen.state = _RUNNING
+                    return chosen
+                wake_at = min((entry[2].not_before for entry in deferred), default=None)
+                self._cond.wait(None if wake_at is None else max(wake_at - now, 0.0))
 
     def start_worker(self):
+        if self._worker is not None:
+            return
+
         def worker():
             while True:
-                task = self.command_queue.get()
+                task = self._next_task()
                 try:
-                    if callable(task):
-                        task()
+                    if callable(task.func):
+                        task.func(*task.args, **task.kwargs)
                 except Exception as exc:  # pragma: no cover
                     print("Error:", exc)
                 finally:
-                    self.command_queue.task_done()
+                    task.state = _DONE
 
-        threading.Thread(target=worker, daemon=True).start()
+        self._worker = threading.Thread(target=worker, daemon=True)
+        self._worker.start()
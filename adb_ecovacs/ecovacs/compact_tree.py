@@ -0,0 +1,166 @@
+"""Compact, array-backed alternative to ``ET.fromstring`` for hierarchy dumps.
+
+Only the attributes the managers actually read are kept. Nodes are stored in
+document (pre-order) order in parallel columns; ``parents`` and ``ends`` (one past
+the last descendant) make child and subtree walks plain index arithmetic. The
+``CompactNode`` view mimics enough of ``ET.Element`` (``attrib``/``get``/iteration/
+``iter``/``find``/``findall``/``iterfind``) for the existing XPath-style queries.
+"""
+
+import io
+from array import array
+from typing import Dict, Iterator, List, Optional
+from xml.etree import ElementPath
+
+try:
+    from lxml import etree as _iterparse_backend
+except ImportError:  # pragma: no cover - lxml is optional
+    import xml.etree.ElementTree as _iterparse_backend
+
+KEPT_ATTRIBUTES = ("text", "content-desc", "resource-id", "bounds", "class", "index", "selected", "checked")
+
+
+class _AttribView:
+    """Read-only mapping over one row of the node table."""
+
+    __slots__ = ("_tree", "_i")
+
+    def __init__(self, tree: "CompactTree", i: int):
+        self._tree = tree
+        self._i = i
+
+    def get(self, key, default=None):
+        column = self._tree.columns.get(key)
+        if column is None:
+            return default
+        value = column[self._i]
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [key for key in KEPT_ATTRIBUTES if self.get(key) is not None]
+
+    def items(self):
+        return [(key, self.get(key)) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class CompactNode:
+    """``ET.Element``-like view of one node in a ``CompactTree``."""
+
+    __slots__ = ("_tree", "_i")
+
+    def __init__(self, tree: "CompactTree", i: int):
+        self._tree = tree
+        self._i = i
+
+    @property
+    def tag(self) -> str:
+        return self._tree.tags[self._i]
+
+    @property
+    def attrib(self) -> _AttribView:
+        return _AttribView(self._tree, self._i)
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def __iter__(self) -> Iterator["CompactNode"]:
+        tree = self._tree
+        child = self._i + 1
+        end = tree.ends[self._i]
+        while child < end:
+            yield tree.node(child)
+            child = tree.ends[child]
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def iter(self, tag: Optional[str] = None) -> Iterator["CompactNode"]:
+        tree = self._tree
+        match_all = tag is None or tag == "*"
+        for i in range(self._i, tree.ends[self._i]):
+            if match_all or tree.tags[i] == tag:
+                yield tree.node(i)
+
+    def iterfind(self, path, namespaces=None):
+        return ElementPath.iterfind(self, path, namespaces)
+
+    def find(self, path, namespaces=None):
+        return ElementPath.find(self, path, namespaces)
+
+    def findall(self, path, namespaces=None):
+        return ElementPath.findall(self, path, namespaces)
+
+    def __repr__(self):
+        return f"<CompactNode {self.tag} #{self._i}>"
+
+
+class CompactTree:
+    """Column store of a parsed hierarchy dump."""
+
+    def __init__(self):
+        self.tags: List[str] = []
+        self.columns: Dict[str, List[Optional[str]]] = {key: [] for key in KEPT_ATTRIBUTES}
+        self.parents = array("i")
+        self.ends = array("i")
+        self._views: List[Optional[CompactNode]] = []
+
+    def __len__(self):
+        return len(self.tags)
+
+    def node(self, i: int) -> CompactNode:
+        """Return the (stable) view for row ``i`` so identity checks keep working."""
+        view = self._views[i]
+        if view is None:
+            view = CompactNode(self, i)
+            self._views[i] = view
+        return view
+
+    @property
+    def root(self) -> CompactNode:
+        return self.node(0)
+
+    def parent(self, node: CompactNode) -> Optional[CompactNode]:
+        parent = self.parents[node._i]
+        return None if parent < 0 else self.node(parent)
+
+
+def parse_compact(xml_str: str) -> CompactNode:
+    """Stream-parse ``xml_str`` into a ``CompactTree`` and return its root view."""
+    tree = CompactTree()
+    interned: Dict[str, str] = {}
+    columns = [(key, tree.columns[key]) for key in KEPT_ATTRIBUTES]
+    stack: List[int] = []
+    source = io.BytesIO(xml_str.encode("utf-8"))
+    for event, elem in _iterparse_backend.iterparse(source, events=("start", "end")):
+        if event == "start":
+            row = len(tree.tags)
+            tree.tags.append(interned.setdefault(elem.tag, elem.tag))
+            attrib = elem.attrib
+            for key, column in columns:
+                value = attrib.get(key)
+                column.append(None if value is None else interned.setdefault(value, value))
+            tree.parents.append(stack[-1] if stack else -1)
+            tree.ends.append(0)
+            stack.append(row)
+        else:
+            tree.ends[stack.pop()] = len(tree.tags)
+            elem.clear()
+    if not tree.tags:
+        raise ValueError("empty hierarchy dump")
+    tree._views = [None] * len(tree.tags)
+    return tree.root
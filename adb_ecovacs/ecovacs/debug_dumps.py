@@ -0,0 +1,71 @@
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Optional, Tuple
+
+DUMP_MODE_OFF = "off"
+DUMP_MODE_ON_FAILURE = "on_failure"
+DUMP_MODE_ALWAYS = "always"
+DUMP_MODES = (DUMP_MODE_OFF, DUMP_MODE_ON_FAILURE, DUMP_MODE_ALWAYS)
+
+
+class DumpRecorder:
+    """Ring buffer of recent UI hierarchy dumps with opt-in disk snapshots.
+
+    ``off`` keeps nothing, ``on_failure`` keeps the last ``history`` dumps in memory
+    until ``flush`` is called, ``always`` additionally writes every dump from a
+    background thread so the caller never blocks on disk I/O.
+    """
+
+    def __init__(self, mode: str = DUMP_MODE_ON_FAILURE, history: int = 5, directory: str = "adb_ecovacs/ui_dumps"):
+        if mode not in DUMP_MODES:
+            print(f"⚠️ Unknown UI dump mode '{mode}', falling back to '{DUMP_MODE_ON_FAILURE}'")
+            mode = DUMP_MODE_ON_FAILURE
+        self.mode = mode
+        self.directory = Path(directory)
+        self.dumps: Deque[Tuple[float, str]] = deque(maxlen=max(history, 1))
+        self._writes: Optional[queue.Queue] = None
+        self._seq = 0
+
+    def record(self, xml_str: str):
+        if self.mode == DUMP_MODE_OFF:
+            return
+        stamp = time.time()
+        self.dumps.append((stamp, xml_str))
+        if self.mode == DUMP_MODE_ALWAYS:
+            self._enqueue(self._next_path(stamp, "dump"), xml_str)
+
+    def flush(self, reason: str = "failure"):
+        """Write the buffered dumps to disk (asynchronously) and clear the buffer."""
+        if not self.dumps:
+            return
+        count = len(self.dumps)
+        while self.dumps:
+            stamp, xml_str = self.dumps.popleft()
+            self._enqueue(self._next_path(stamp, reason), xml_str)
+        print(f"🗂️ Flushing {count} UI dump(s) to {self.directory} ({reason})")
+
+    def _next_path(self, stamp: float, label: str) -> Path:
+        self._seq += 1
+        safe_label = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in label)
+        name = time.strftime("%Y%m%d-%H%M%S", time.localtime(stamp))
+        return self.directory / f"{name}-{self._seq:04d}-{safe_label}.xml"
+
+    def _enqueue(self, path: Path, xml_str: str):
+        if self._writes is None:
+            self._writes = queue.Queue()
+            threading.Thread(target=self._writer, daemon=True).start()
+        self._writes.put((path, xml_str))
+
+    def _writer(self):
+        while True:
+            path, xml_str = self._writes.get()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(xml_str, encoding="utf-8")
+            except OSError as exc:
+                print("Warning: could not write UI dump:", exc)
+            finally:
+                self._writes.task_done()
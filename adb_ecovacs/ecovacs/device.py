@@ -1,52 +1,184 @@
+import base64
+import hashlib
+import io
 import re
 import xml.etree.ElementTree as ET
-from typing import Optional
+from time import monotonic, sleep
+from typing import Callable, Dict, Optional
+
+from PIL import Image
+
+from .compact_tree import parse_compact
+from .debug_dumps import DumpRecorder
+from .tree_index import TreeIndex
+
+
+PARSE_STATS_LOG_EVERY = 100
+TREE_PARSER_ETREE = "etree"
+TREE_PARSER_COMPACT = "compact"
+# Error fragments meaning the on-device agent has no reduced-size screenshot RPC at all.
+UNSUPPORTED_RPC_MARKERS = ("-32601", "method not found", "no such method", "unknown method")
+
+
+def _is_unsupported_rpc(exc: Exception) -> bool:
+    if isinstance(exc, (AttributeError, NotImplementedError)):
+        return True
+    message = str(exc).lower()
+    return any(marker in message for marker in UNSUPPORTED_RPC_MARKERS)
 
 
 class DeviceController:
     """Wrapper around the uiautomator device with cached XML access."""
 
-    def __init__(self, device):
-        self.device = device
+    def __init__(
+        self,
+        device=None,
+        dump_recorder: Optional[DumpRecorder] = None,
+        parser: str = TREE_PARSER_ETREE,
+        connect: Optional[Callable[[], object]] = None,
+    ):
+        # With ``connect`` the USB/uiautomator2 session is opened on first use, not at startup.
+        self._device = device
+        self._connect = connect
+        if parser not in (TREE_PARSER_ETREE, TREE_PARSER_COMPACT):
+            print(f"⚠️ Unknown UI tree parser '{parser}', falling back to '{TREE_PARSER_ETREE}'")
+            parser = TREE_PARSER_ETREE
+        self.parser = parser
+        self.dump_recorder = dump_recorder if dump_recorder is not None else DumpRecorder()
         self._tree_cache: Optional[ET.Element] = None
+        self._index: Optional[TreeIndex] = None
+        # Last parsed dump, kept across clear_tree() so identical dumps skip parsing.
+        self._parsed_digest: Optional[bytes] = None
+        self._parsed_tree: Optional[ET.Element] = None
+        self._parsed_index: Optional[TreeIndex] = None
+        self.tree_version = 0
+        # Bumped by every interaction (clicks, swipes, key presses, screen wake); a remembered page expires with it.
+        self.navigation_epoch = 0
+        self.parse_cache_hits = 0
+        self.parse_cache_misses = 0
+        # Cleared after the first failed reduced capture so we stop asking the agent.
+        self._reduced_screenshot_supported = True
+
+    @property
+    def device(self):
+        if self._device is None and self._connect is not None:
+            print("🔌 Attaching to Android device")
+            self._device = self._connect()
+        return self._device
+
+    @device.setter
+    def device(self, device):
+        self._device = device
 
     # --------------------------
     # Cached XML Helper
     # --------------------------
     def refresh_tree(self) -> ET.Element:
-        """Dump UI hierarchy to disk and refresh the cached tree."""
+        """Dump the UI hierarchy and refresh the cached tree (memory only)."""
         xml_str = self.device.dump_hierarchy()
-        with open("adb_ecovacs/ui_dump.xml", "w", encoding="utf-8") as f:
-            f.write(xml_str)
-        self._tree_cache = ET.fromstring(xml_str)
+        digest = hashlib.blake2b(xml_str.encode("utf-8"), digest_size=16).digest()
+        if digest == self._parsed_digest and self._parsed_tree is not None:
+            self.parse_cache_hits += 1
+        else:
+            self.parse_cache_misses += 1
+            self.dump_recorder.record(xml_str)
+            self._parsed_tree = self._parse(xml_str)
+            self._parsed_index = TreeIndex(self._parsed_tree)
+            self._parsed_digest = digest
+            self.tree_version += 1
+        self._tree_cache = self._parsed_tree
+        self._index = self._parsed_index
+        if (self.parse_cache_hits + self.parse_cache_misses) % PARSE_STATS_LOG_EVERY == 0:
+            stats = self.parse_cache_stats()
+            print(
+                f"🧮 UI parse cache: {stats['hits']} hits / {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} reused)"
+            )
         return self._tree_cache
 
+    def _parse(self, xml_str: str):
+        if self.parser == TREE_PARSER_COMPACT:
+            return parse_compact(xml_str)
+        return ET.fromstring(xml_str)
+
+    def parse_cache_stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for the dump dedup cache."""
+        total = self.parse_cache_hits + self.parse_cache_misses
+        return {
+            "hits": self.parse_cache_hits,
+            "misses": self.parse_cache_misses,
+            "hit_rate": self.parse_cache_hits / total if total else 0.0,
+        }
+
     def get_tree(self) -> ET.Element:
         """Return the cached tree, refreshing if necessary."""
         if self._tree_cache is None:
             return self.refresh_tree()
         return self._tree_cache
 
+    def has_tree(self) -> bool:
+        """True if a dump is cached, i.e. ``get_tree()`` would not hit the device."""
+        return self._tree_cache is not None
+
     def clear_tree(self):
-        """Invalidate the cached tree after an interaction."""
+        """Invalidate the cached tree after an interaction; the next access re-dumps."""
         self._tree_cache = None
+        self._index = None
+
+    def wait_for(
+        self,
+        predicate: Callable[[], object],
+        timeout: float = 5.0,
+        initial_delay: float = 0.05,
+        max_delay: float = 0.5,
+        backoff: float = 2.0,
+        fresh: bool = True,
+    ):
+        """
+        Poll the hierarchy until ``predicate()`` returns a truthy value and return it.
+        Sleeps grow exponentially from ``initial_delay`` up to ``max_delay``; returns
+        None once ``timeout`` seconds have passed. With ``fresh=False`` the first check
+        uses the cached tree (if any) instead of dumping again.
+        """
+        deadline = monotonic() + timeout
+        delay = initial_delay
+        if fresh:
+            self.refresh_tree()
+        while True:
+            result = predicate()
+            if result:
+                return result
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return None
+            sleep(min(delay, remaining))
+            delay = min(delay * backoff, max_delay)
+            self.refresh_tree()
+
+    def flush_debug_dumps(self, reason: str = "failure"):
+        """Persist the recently recorded UI dumps, e.g. after a failed navigation."""
+        self.dump_recorder.flush(reason)
+
+    def get_index(self) -> TreeIndex:
+        """Return the lookup index for the cached tree, refreshing if necessary."""
+        if self._index is None:
+            self.refresh_tree()
+        return self._index
 
     # --------------------------
     # XML Query Helpers
     # --------------------------
     def find_by_text(self, text: str, contains: bool = False):
-        for elem in self.get_tree().iter("node"):
-            t = elem.attrib.get("text", "")
-            if (contains and text in t) or (not contains and t == text):
-                return elem
-        return None
+        return self.get_index().find_text(text, contains)
 
     def find_by_desc(self, desc: str, contains: bool = False):
-        for elem in self.get_tree().iter("node"):
-            dsc = elem.attrib.get("content-desc", "")
-            if (contains and desc in dsc) or (not contains and dsc == desc):
-                return elem
-        return None
+        return self.get_index().find_desc(desc, contains)
+
+    def find_by_resource_id(self, resource_id: str):
+        return self.get_index().find_resource_id(resource_id)
+
+    def find_by_class_index(self, cls: str, index) -> list:
+        return self.get_index().find_class_index(cls, index)
 
     # --------------------------
     # Interaction helpers
@@ -64,31 +196,62 @@ class DeviceController:
         x = (x1 + x2) / 2
         y = (y1 + y2) / 2
         self.device.click(x, y)
+        self.navigation_epoch += 1
         self.clear_tree()
         return True
 
     def swipe(self, *args, **kwargs):
         self.device.swipe(*args, **kwargs)
+        self.navigation_epoch += 1
         self.clear_tree()
 
     def drag(self, *args, **kwargs):
         self.device.drag(*args, **kwargs)
+        self.navigation_epoch += 1
         self.clear_tree()
 
     def press(self, *args, **kwargs):
         self.device.press(*args, **kwargs)
+        self.navigation_epoch += 1
         self.clear_tree()
 
     def screen_on(self):
         self.device.screen_on()
+        self.navigation_epoch += 1
         self.clear_tree()
 
     def double_click(self, *args, **kwargs):
         self.device.double_click(*args, **kwargs)
+        self.navigation_epoch += 1
         self.clear_tree()
 
-    def screenshot(self):
-        return self.device.screenshot()
+    def screenshot(self, scale: float = 1.0, quality: int = 100):
+        """
+        Capture the screen. With ``scale`` < 1 or ``quality`` < 100 the on-device agent
+        encodes a smaller JPEG frame, so far fewer bytes cross USB. If the agent cannot
+        do that, a full capture is taken and scaled here instead.
+        """
+        if scale >= 1.0 and quality >= 100:
+            return self.device.screenshot()
+        if self._reduced_screenshot_supported:
+            try:
+                encoded = self.device.jsonrpc.takeScreenshot(scale, quality)
+                if encoded:
+                    img = Image.open(io.BytesIO(base64.b64decode(encoded)))
+                    return img.convert("RGB")
+                raise ValueError("empty response")
+            except Exception as exc:
+                if _is_unsupported_rpc(exc):
+                    print(f"⚠️ Reduced screenshot not supported ({exc}); using full-size captures from now on")
+                    self._reduced_screenshot_supported = False
+                else:
+                    # Timeouts, empty frames, a restarting agent: fall back for this capture only.
+                    print(f"⚠️ Reduced screenshot failed ({exc}); falling back to a full-size capture")
+        img = self.device.screenshot()
+        if scale < 1.0:
+            w, h = img.size
+            img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.BOX)
+        return img
 
     # --------------------------
     # UI-specific helpers
@@ -105,9 +268,7 @@ class DeviceController:
                     return child
             return None
 
-        for elem in self.get_tree().iter("node"):
-            if elem.attrib.get("class") != "android.view.View" or elem.attrib.get("index") != "0":
-                continue
+        for elem in self.find_by_class_index("android.view.View", "0"):
             level1 = _first_child(elem, "android.view.View")
             if level1 is None:
                 continue
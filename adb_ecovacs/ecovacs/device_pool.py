@@ -0,0 +1,84 @@
+import threading
+from typing import Dict, List
+
+from mqtt_cache import shared_cache
+
+from .bridge import RobotBridge
+from .mqtt_entities import publish_bulk
+
+
+class DevicePool:
+    """All configured robots sharing one MQTT connection.
+
+    Each bridge has its own worker thread, so commands for different robots run in
+    parallel while commands for one robot stay serialized.
+    """
+
+    def __init__(self):
+        self.bridges: List[RobotBridge] = []
+        self.client = None
+        self._routes: Dict[str, RobotBridge] = {}
+        self.connected = threading.Event()
+        # (qos, window, timeout) of the startup discovery; reused to re-announce after a reconnect.
+        self._discovery_args = None
+
+    def add(self, bridge: RobotBridge) -> RobotBridge:
+        bridge.on_topic_added = self._route_topic
+        for topic in bridge.command_handlers:
+            self._route_topic(bridge, topic)
+        self.bridges.append(bridge)
+        return bridge
+
+    def _route_topic(self, bridge: RobotBridge, topic: str):
+        owner = self._routes.get(topic)
+        if owner is not None and owner is not bridge:
+            print(f"⚠️ Topic {topic} already routed to {owner.name}; ignoring duplicate from {bridge.name}")
+            return
+        self._routes[topic] = bridge
+        if self.client is not None and self.client.is_connected():
+            self.client.subscribe(topic)
+            print(f"🔔 Subscribed to {topic}")
+
+    def attach(self, client):
+        """Install the shared client's callbacks."""
+        self.client = client
+        client.on_connect = self.on_connect
+        client.on_message = self.on_message
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        print("Connected to MQTT broker with result code", rc)
+        if getattr(rc, "is_failure", rc != 0):
+            return
+        self.connected.set()
+        # The broker may have restarted without persistence; allow every state to be sent again.
+        shared_cache.invalidate()
+        for bridge in self.bridges:
+            # The retained map image may be gone too; upload the next frame even if it looks the same.
+            bridge.maps.change_detector.reset()
+        if self._discovery_args is not None:
+            # Waiting for acks needs the network loop, so this cannot run in its callback.
+            threading.Thread(
+                target=self.publish_discovery, args=self._discovery_args, name="mqtt-rediscovery", daemon=True
+            ).start()
+        topics = list(self._routes)
+        if topics:
+            client.subscribe([(topic, 0) for topic in topics])
+            print(f"🔔 Subscribed to {len(topics)} command topics across {len(self.bridges)} robot(s)")
+
+    def publish_discovery(self, qos: int = 1, window: int = 20, timeout: float = 10.0):
+        """Announce every robot's entities in one pipelined batch and wait for the acks."""
+        self._discovery_args = (qos, window, timeout)
+        messages = [message for bridge in self.bridges for message in bridge.discovery_messages()]
+        result = publish_bulk(self.client, messages, qos=qos, window=window, timeout=timeout, force=True)
+        print(
+            f"🏠 All entities discovered: {result['acked']}/{result['sent']} messages acknowledged "
+            f"in {result['elapsed']:.2f}s (qos={qos}, window={window})"
+        )
+        return result
+
+    def on_message(self, client, userdata, msg):
+        bridge = self._routes.get(msg.topic)
+        if bridge is None:
+            print(f"⚠️ No entity matched topic {msg.topic}")
+            return
+        bridge.handle_message(msg.topic, msg.payload.decode())
@@ -0,0 +1,49 @@
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+class EntityInventory:
+    """Last known room list and switch states, persisted as JSON.
+
+    Lets a restarted bridge announce its entities straight away and reconcile
+    them against the phone afterwards, instead of unlocking and navigating first.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.rooms: List[Tuple[str, bool]] = []
+        self._load()
+
+    def _load(self):
+        if self.path is None or not self.path.is_file():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            print("Warning: could not load entity cache:", exc)
+            return
+        rooms = data.get("rooms") if isinstance(data, dict) else None
+        if isinstance(rooms, list):
+            self.rooms = [
+                (str(room[0]), bool(room[1]))
+                for room in rooms
+                if isinstance(room, (list, tuple)) and len(room) == 2
+            ]
+
+    def update(self, rooms: List[Tuple[str, bool]]):
+        """Remember ``rooms`` (name, enabled) and write the file if anything changed."""
+        rooms = [(name, bool(enabled)) for name, enabled in rooms]
+        if rooms == self.rooms:
+            return
+        self.rooms = rooms
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps({"rooms": rooms}, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            print("Warning: could not save entity cache:", exc)
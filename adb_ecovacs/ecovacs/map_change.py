@@ -0,0 +1,74 @@
+from time import monotonic
+from typing import Optional
+
+from PIL import Image, ImageChops
+
+# Thumbnail edge length used for comparison; small enough to be cheap, large
+# enough that a new stretch of cleaned path still moves a few cells.
+THUMBNAIL_SIZE = 64
+# Per-cell grey level difference below which a cell counts as unchanged
+# (absorbs JPEG-ish noise and antialiasing shimmer of the map render).
+PIXEL_TOLERANCE = 8
+
+
+class MapChangeDetector:
+    """
+    Compare processed map frames against the last one that was actually uploaded.
+
+    Frames are reduced to a ``THUMBNAIL_SIZE`` square greyscale thumbnail; a frame
+    is "unchanged" when the fraction of thumbnail cells that moved by more than
+    ``PIXEL_TOLERANCE`` is at most ``threshold``. A negative threshold disables
+    detection so every frame is uploaded. With ``resync_interval`` > 0 an unchanged
+    frame is uploaded anyway once the last upload is that many seconds old, matching
+    the MQTT publish cache resync; ``reset()`` forces the next upload (reconnect).
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.002,
+        size: int = THUMBNAIL_SIZE,
+        tolerance: int = PIXEL_TOLERANCE,
+        resync_interval: float = 0.0,
+    ):
+        self.threshold = threshold
+        self.size = size
+        self.tolerance = tolerance
+        self.resync_interval = resync_interval
+        self._last: Optional[Image.Image] = None
+        self._last_at = 0.0
+        self.unchanged_count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold >= 0
+
+    def thumbnail(self, img: Image.Image) -> Image.Image:
+        return img.convert("L").resize((self.size, self.size), Image.BOX)
+
+    def difference(self, thumb: Image.Image) -> float:
+        """Fraction of thumbnail cells that differ from the last uploaded frame (1.0 if none yet)."""
+        if self._last is None or self._last.size != thumb.size:
+            return 1.0
+        diff = ImageChops.difference(thumb, self._last)
+        changed = sum(diff.histogram()[self.tolerance + 1:])
+        return changed / float(thumb.size[0] * thumb.size[1])
+
+    def resync_due(self) -> bool:
+        return self.resync_interval > 0 and monotonic() - self._last_at >= self.resync_interval
+
+    def is_unchanged(self, thumb: Image.Image) -> bool:
+        if not self.enabled or self.resync_due():
+            return False
+        if self.difference(thumb) <= self.threshold:
+            self.unchanged_count += 1
+            return True
+        return False
+
+    def mark_uploaded(self, thumb: Image.Image):
+        """Remember ``thumb`` as the reference; only call after a successful upload."""
+        self._last = thumb
+        self._last_at = monotonic()
+
+    def reset(self):
+        """Forget the reference so the next frame is uploaded, e.g. after an MQTT reconnect."""
+        self._last = None
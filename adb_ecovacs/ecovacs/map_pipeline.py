@@ -0,0 +1,66 @@
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional
+
+
+class FrameWorker:
+    """
+    Background stage for captured map frames.
+
+    ``submit()`` never blocks the caller: frames go into a bounded buffer and, when
+    it is full, the oldest waiting frame is dropped since a newer capture
+    supersedes it. One daemon thread feeds frames to ``handler`` in order.
+    """
+
+    def __init__(self, handler: Callable[[object], None], maxsize: int = 2, name: str = "map-pipeline"):
+        self.handler = handler
+        self.maxsize = max(1, maxsize)
+        self.name = name
+        self.dropped = 0
+        self._frames: Deque[object] = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, frame) -> None:
+        with self._cond:
+            while len(self._frames) >= self.maxsize:
+                self._frames.popleft()
+                self.dropped += 1
+                print(f"⏭️ Dropping stale map frame ({self.dropped} dropped so far)")
+            self._frames.append(frame)
+            self._cond.notify()
+        self._ensure_started()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._frames)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted frame has been handled (mainly for scripts/tests)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._frames and not self._busy, timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._frames)
+                frame = self._frames.popleft()
+                self._busy = True
+            try:
+                self.handler(frame)
+            except Exception as exc:  # pragma: no cover
+                print("Error in map pipeline:", exc)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
@@ -0,0 +1,83 @@
+from typing import Tuple
+
+from PIL import Image, ImageDraw
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the fast path falls back to floodfill
+    np = None
+
+# Vertical band of the (half-size) screenshot that contains the map.
+MAP_CROP_TOP = 0.09
+MAP_CROP_BOTTOM = 0.55
+# Colour distance (sum of channel differences) still treated as background.
+BACKGROUND_THRESHOLD = 25
+TRANSPARENT = (255, 255, 255, 0)
+
+
+def _crop_box(w: int, h: int) -> Tuple[int, int, int, int]:
+    return 0, int(h * MAP_CROP_TOP), w, int(h * MAP_CROP_BOTTOM)
+
+
+def process_map_legacy(img: Image.Image, capture_scale: float = 1.0) -> Image.Image:
+    """Original pipeline: LANCZOS half-size resize, crop, then floodfill the background."""
+    factor = 2 * capture_scale
+    w, h = img.size
+    if factor != 1:
+        img = img.resize((int(w / factor), int(h / factor)), Image.LANCZOS)
+    w, h = img.size
+    img = img.crop(_crop_box(w, h)).convert("RGBA")
+    ImageDraw.floodfill(img, xy=(0, -1), value=TRANSPARENT, thresh=BACKGROUND_THRESHOLD)
+    return img
+
+
+def _mask_background(img: Image.Image) -> bool:
+    """
+    Make every background-coloured pixel transparent in one vectorized pass.
+
+    Only used when all four corners share the background colour; otherwise the
+    caller falls back to floodfill. Unlike floodfill this also clears enclosed
+    pockets of background colour, which render identically in HA anyway.
+    """
+    if np is None:
+        return False
+    arr = np.asarray(img).copy()
+    h, w = arr.shape[:2]
+    ref = arr[h - 1, 0].astype(np.int16)
+    corners = arr[[0, 0, h - 1, h - 1], [0, w - 1, 0, w - 1]].astype(np.int16)
+    if (np.abs(corners - ref).sum(axis=1) > BACKGROUND_THRESHOLD).any():
+        return False
+    mask = np.abs(arr.astype(np.int16) - ref).sum(axis=2) <= BACKGROUND_THRESHOLD
+    arr[mask] = TRANSPARENT
+    img.paste(Image.fromarray(arr, "RGBA"))
+    return True
+
+
+def process_map_fast(img: Image.Image, capture_scale: float = 1.0) -> Image.Image:
+    """
+    Same output geometry as ``process_map_legacy`` with less work: crop the
+    full-resolution frame first, halve it with ``reduce(2)`` (box average) and
+    replace the floodfill with a NumPy mask when the background is uniform.
+    ``capture_scale`` is the scale the frame was captured at (0.5 = already halved).
+    """
+    factor = 2 * capture_scale
+    w, h = img.size
+    left, top, right, bottom = _crop_box(int(w / factor), int(h / factor))
+    if abs(factor - round(factor)) < 1e-6 and round(factor) >= 1:
+        f = round(factor)
+        img = img.crop((left * f, top * f, right * f, bottom * f))
+        if f > 1:
+            img = img.reduce(f)
+    else:
+        src = tuple(round(v * factor) for v in (left, top, right, bottom))
+        img = img.crop(src).resize((right - left, bottom - top), Image.BOX)
+    img = img.convert("RGBA")
+    if not _mask_background(img):
+        ImageDraw.floodfill(img, xy=(0, -1), value=TRANSPARENT, thresh=BACKGROUND_THRESHOLD)
+    return img
+
+
+PIPELINES = {
+    "legacy": process_map_legacy,
+    "fast": process_map_fast,
+}
@@ -0,0 +1,165 @@
+import random
+import threading
+from time import monotonic
+from typing import Callable, Optional
+
+# Growth factor applied to the interval every time a refresh shows an unchanged map.
+BACKOFF_FACTOR = 2.0
+# +/- fraction of randomness added to every interval so robots/containers drift apart.
+JITTER = 0.1
+# Upper bound of the interval while the robot is moving but the map looks the same.
+ACTIVE_MAX_INTERVAL = 60.0
+# Lower-cased status phrases that mean the robot is driving around.
+ACTIVE_STATUS_PHRASES = ("cleaning", "returning", "mopping", "vacuuming", "relocating", "going to", "moving", "mapping")
+# Phrases that mark a finished or halted run even when an active phrase appears ("Cleaning completed").
+INACTIVE_STATUS_PHRASES = ("completed", "complete", "finished", "paused")
+
+
+def is_active_status(status: Optional[str]) -> bool:
+    status = (status or "").strip().lower()
+    if any(phrase in status for phrase in INACTIVE_STATUS_PHRASES):
+        return False
+    return any(phrase in status for phrase in ACTIVE_STATUS_PHRASES)
+
+
+class RefreshScheduler:
+    """
+    Single thread deciding when the next map refresh is due.
+
+    The interval starts at ``active_interval`` while the robot is moving and at
+    ``idle_interval`` otherwise, grows by ``BACKOFF_FACTOR`` each time a refresh
+    produced an unchanged map, and never exceeds ``max_staleness``. A status change
+    or ``trigger()`` makes the next refresh due immediately. ``on_due`` only queues
+    the work; ``refresh_done()`` must be called once a refresh has finished.
+    """
+
+    def __init__(
+        self,
+        on_due: Callable[[], None],
+        active_interval: float = 5.0,
+        idle_interval: float = 900.0,
+        max_staleness: float = 3600.0,
+        name: str = "map-scheduler",
+    ):
+        self.on_due = on_due
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.max_staleness = max(max_staleness, active_interval)
+        self.name = name
+        self.status: Optional[str] = None
+        self.interval = idle_interval
+        self._last_run: Optional[float] = None
+        self._due: Optional[float] = None
+        self._in_flight = False
+        self._in_flight_since = 0.0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    # --------------------------
+    # Inputs
+    # --------------------------
+    def note_status(self, status: Optional[str]):
+        """Feed the latest robot status; a change makes the next refresh due now."""
+        with self._cond:
+            previous, self.status = self.status, status
+            if status == previous:
+                return
+            self.interval = self._base_interval()
+            if previous is None:
+                # First reading after start: pick the matching interval, the refresh already runs.
+                return
+            print(f"🔔 Status changed '{previous}' -> '{status}'; refreshing map now")
+            self._set_due(monotonic())
+
+    def note_frame(self, changed: bool):
+        """Back off while refreshes keep producing the same map, reset when it moves."""
+        with self._cond:
+            if changed:
+                self.interval = self._base_interval()
+            else:
+                cap = ACTIVE_MAX_INTERVAL if is_active_status(self.status) else self.max_staleness
+                self.interval = min(max(self.interval * BACKOFF_FACTOR, self._base_interval()), cap, self.max_staleness)
+            self._reschedule()
+
+    def boost(self, reason: str = ""):
+        """Expect activity soon (e.g. after an HA command): fall back to the fast interval."""
+        with self._cond:
+            self.interval = self.active_interval
+            print(f"⏩ Map refresh interval reset to {self.interval:.0f}s ({reason or 'boost'})")
+            self._reschedule()
+
+    def trigger(self, reason: str = ""):
+        with self._cond:
+            print(f"⏩ Map refresh requested now ({reason or 'trigger'})")
+            self._set_due(monotonic())
+
+    def refresh_done(self):
+        with self._cond:
+            self._in_flight = False
+            self._last_run = monotonic()
+            self._reschedule()
+
+    # --------------------------
+    # Scheduling
+    # --------------------------
+    def _base_interval(self) -> float:
+        return self.active_interval if is_active_status(self.status) else self.idle_interval
+
+    def _reschedule(self):
+        if self._in_flight or self._last_run is None:
+            return
+        delay = min(self.interval * random.uniform(1 - JITTER, 1 + JITTER), self.max_staleness)
+        self._set_due(self._last_run + delay)
+        print(f"🗓️ Next map refresh in {max(self._due - monotonic(), 0):.0f} seconds (status: {self.status})")
+
+    def _set_due(self, due: float):
+        # Never later than the staleness bound, whatever the interval says.
+        if self._last_run is not None:
+            due = min(due, self._last_run + self.max_staleness)
+        self._due = due
+        self._cond.notify()
+
+    def start(self):
+        """Start the thread; the first refresh is due immediately."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._due = monotonic()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _take_due(self, now: float) -> bool:
+        """Claim the refresh if one is due at ``now``; called with the lock held."""
+        if self._in_flight and now - self._in_flight_since >= self.max_staleness:
+            # Watchdog: a refresh that never reports back must not stall the loop.
+            print("⚠️ Map refresh did not report back; scheduling another")
+            self._in_flight = False
+            self._due = now
+        if self._in_flight or self._due is None or now < self._due:
+            return False
+        self._in_flight = True
+        self._in_flight_since = now
+        self._due = None
+        return True
+
+    def _wait_timeout(self, now: float) -> float:
+        """How long the loop may sleep before ``_take_due`` has to look again."""
+        if self._in_flight:
+            return max(self._in_flight_since + self.max_staleness - now, 0.0)
+        if self._due is None:
+            return self.max_staleness
+        return max(self._due - now, 0.0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = monotonic()
+                    if self._take_due(now):
+                        break
+                    self._cond.wait(self._wait_timeout(now))
+            try:
+                self.on_due()
+            except Exception as exc:  # pragma: no cover
+                print("Error scheduling map refresh:", exc)
+                self.refresh_done()
@@ -0,0 +1,171 @@
+import getpass
+import io
+import posixpath
+import stat
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+try:
+    import paramiko
+except ImportError:  # pragma: no cover - only needed for MAP_UPLOAD_MODE=sftp
+    paramiko = None
+
+
+class ScpUploader:
+    """Legacy upload path: write the PNG locally and copy it with the ``scp`` binary."""
+
+    def __init__(self, target: Optional[str], key_path: Optional[str] = None, known_hosts_path: Optional[str] = None):
+        self.target = target
+        self.key_path = key_path
+        self.known_hosts_path = known_hosts_path
+
+    def _command(self, local_path: str):
+        scp_cmd = ["scp", "-o", "StrictHostKeyChecking=accept-new"]
+        if self.key_path and Path(self.key_path).is_file():
+            scp_cmd += ["-i", self.key_path, "-o", "IdentitiesOnly=yes"]
+            if self.known_hosts_path and Path(self.known_hosts_path).is_file():
+                scp_cmd += ["-o", f"UserKnownHostsFile={self.known_hosts_path}"]
+        return scp_cmd + [local_path, self.target]
+
+    def upload(self, data: bytes, local_path: str) -> bool:
+        if not self.target:
+            print("Map upload target not configured; skipping map transfer.")
+            return False
+        # scp can only copy files, so this backend still needs the on-disk copy.
+        Path(local_path).write_bytes(data)
+        try:
+            subprocess.run(self._command(local_path), check=True)
+            print("File successfully copied to Home Assistant.")
+            return True
+        except FileNotFoundError:
+            print("Warning: scp binary not available; install OpenSSH client or skip map uploads.")
+        except subprocess.CalledProcessError as exc:
+            print("Error during SCP:", exc)
+        return False
+
+
+def parse_scp_target(target: str) -> Tuple[str, str, str]:
+    """Split an scp-style ``[user@]host:path`` target into (user, host, path)."""
+    host_part, sep, path = target.partition(":")
+    if not sep or not host_part:
+        raise ValueError(f"Map upload target must look like [user@]host:path, got: {target}")
+    user, at, host = host_part.rpartition("@")
+    if not at:
+        user = getpass.getuser()
+    return user, host, path or "."
+
+
+class SftpUploader:
+    """
+    Upload backend that keeps one authenticated SSH/SFTP session open between maps.
+    Files are written to ``<name>.tmp`` and renamed, so HA never serves a partial PNG.
+    A failed upload drops the session and retries once on a fresh connection.
+    ``client_factory`` returns a connected paramiko-like client (``open_sftp``,
+    ``get_transport``, ``close``); tests can pass an in-process stub.
+    """
+
+    def __init__(
+        self,
+        target: Optional[str],
+        key_path: Optional[str] = None,
+        known_hosts_path: Optional[str] = None,
+        port: int = 22,
+        client_factory: Optional[Callable[[], object]] = None,
+        timeout: float = 10.0,
+    ):
+        self.target = target
+        self.key_path = key_path
+        self.known_hosts_path = known_hosts_path
+        self.port = port
+        self.timeout = timeout
+        self._client_factory = client_factory or self._connect
+        self._client = None
+        self._sftp = None
+        self._remote_dir: Optional[str] = None
+        self._remote_file: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if paramiko is None:
+            raise RuntimeError("paramiko is not installed; install it or use MAP_UPLOAD_MODE=scp")
+        user, host, _ = parse_scp_target(self.target)
+        client = paramiko.SSHClient()
+        known_hosts = Path(self.known_hosts_path) if self.known_hosts_path else None
+        if known_hosts is not None and known_hosts.is_file():
+            client.load_host_keys(str(known_hosts))
+        # Same trust model as the scp backend's StrictHostKeyChecking=accept-new: a host
+        # seen for the first time is trusted and saved, a known host must present its saved
+        # key (paramiko raises BadHostKeyException on a mismatch).
+        host_entry = host if self.port == 22 else f"[{host}]:{self.port}"
+        if client.get_host_keys().lookup(host_entry) is not None:
+            client.set_missing_host_key_policy(paramiko.RejectPolicy())
+        else:
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        key_file = self.key_path if self.key_path and Path(self.key_path).is_file() else None
+        client.connect(
+            host,
+            port=self.port,
+            username=user,
+            key_filename=key_file,
+            look_for_keys=key_file is None,
+            timeout=self.timeout,
+        )
+        if known_hosts is not None:
+            try:
+                known_hosts.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+                client.save_host_keys(str(known_hosts))
+            except OSError as exc:
+                print(f"Warning: could not save SFTP host key to {known_hosts}: {exc}")
+        return client
+
+    def _session(self):
+        transport = self._client.get_transport() if self._client is not None else None
+        if self._sftp is not None and transport is not None and transport.is_active():
+            return self._sftp
+        self.close()
+        self._client = self._client_factory()
+        self._sftp = self._client.open_sftp()
+        _, _, path = parse_scp_target(self.target)
+        try:
+            is_dir = path.endswith("/") or stat.S_ISDIR(self._sftp.stat(path).st_mode)
+        except OSError:
+            is_dir = False
+        self._remote_dir = path if is_dir else None
+        self._remote_file = None if is_dir else path
+        print(f"🔐 SFTP session opened to {self.target}")
+        return self._sftp
+
+    def _remote_path(self, name: str) -> str:
+        if self._remote_dir is None:
+            return self._remote_file
+        return posixpath.join(self._remote_dir, name)
+
+    def upload(self, data: bytes, name: str) -> bool:
+        if not self.target:
+            print("Map upload target not configured; skipping map transfer.")
+            return False
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    sftp = self._session()
+                    remote_path = self._remote_path(name)
+                    tmp_path = f"{remote_path}.tmp"
+                    sftp.putfo(io.BytesIO(data), tmp_path)
+                    sftp.posix_rename(tmp_path, remote_path)
+                    print("File successfully copied to Home Assistant.")
+                    return True
+                except Exception as exc:  # paramiko raises a mix of OSError/SSHException
+                    print(f"Error during SFTP upload (attempt {attempt}/2): {exc}")
+                    self.close()
+        return False
+
+    def close(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:  # pragma: no cover - best effort
+                pass
+        self._client = None
+        self._sftp = None
@@ -1,22 +1,43 @@
-import subprocess
+import io
 import threading
 from pathlib import Path
-from typing import Optional
-
-from PIL import Image, ImageDraw
+from typing import Callable, Optional
 
 from settings import (
+    MAP_CHANGE_THRESHOLD,
+    MAP_PNG_COMPRESS_LEVEL,
+    MAP_PIPELINE_QUEUE_SIZE,
+    MAP_PNG_OPTIMIZE,
+    MAP_PROCESSING,
+    MAP_REFRESH_INTERVAL_ACTIVE,
+    MAP_REFRESH_INTERVAL_IDLE,
+    MAP_REFRESH_MAX_STALENESS,
+    MAP_SCREENSHOT_QUALITY,
+    MAP_SCREENSHOT_SCALE,
+    MAP_STATUS_POLL_INTERVAL,
+    MAP_UPLOAD_MODE,
     MAP_UPLOAD_SSH_KEY_PATH,
     MAP_UPLOAD_SSH_KNOWN_HOSTS_PATH,
     MAP_UPLOAD_TARGET,
+    MQTT_RESYNC_INTERVAL,
 )
 
+from .command_queue import PRIORITY_PERIODIC
 from .device import DeviceController
+from .map_change import MapChangeDetector
+from .map_pipeline import FrameWorker
+from .map_processing import PIPELINES
+from .map_scheduler import RefreshScheduler
+from .map_upload import ScpUploader, SftpUploader
 from .navigation import Navigator
 
 
-MAP_REFRESH_INTERVAL_CLEANING = 10
-MAP_REFRESH_INTERVAL_IDLE = 3600
+MAP_REFRESH_TASK_KEY = "map_refresh"
+STATUS_POLL_TASK_KEY = "status_poll"
+UPLOAD_MODE_SCP = "scp"
+UPLOAD_MODE_SFTP = "sftp"
+UPLOAD_MODE_MQTT = "mqtt"
+UPLOAD_MODE_NONE = "none"
 
 
 class MapManager:
@@ -27,57 +48,108 @@ class MapManager:
         device: DeviceController,
         navigator: Navigator,
         queue_task,
+        image_name: str = "Map_cropped.png",
+        upload_mode: str = MAP_UPLOAD_MODE,
+        pending_tasks: Optional[Callable[[], int]] = None,
     ):
         self.device = device
+        self.image_path = f"adb_ecovacs/{image_name}"
         self.navigator = navigator
         self.queue_task = queue_task
-        self.map_refresh_timer: Optional[threading.Timer] = None
+        # Number of tasks waiting on the device worker; status polls are skipped while it is > 0.
+        self.pending_tasks = pending_tasks
+        self.scheduler = RefreshScheduler(
+            self.queue_map_refresh,
+            active_interval=MAP_REFRESH_INTERVAL_ACTIVE,
+            idle_interval=MAP_REFRESH_INTERVAL_IDLE,
+            max_staleness=MAP_REFRESH_MAX_STALENESS,
+            name=f"map-scheduler-{image_name}",
+        )
         self.last_map_status = "Unknown"
+        self.status_poll_interval = MAP_STATUS_POLL_INTERVAL
+        self._status_poll_stop = threading.Event()
+        self._status_poll_thread = None
         self.map_status_entity = None
+        self.map_image_entity = None
+        self.map_unchanged_entity = None
+        self.change_detector = MapChangeDetector(MAP_CHANGE_THRESHOLD, resync_interval=MQTT_RESYNC_INTERVAL)
+        if upload_mode not in (UPLOAD_MODE_SCP, UPLOAD_MODE_SFTP, UPLOAD_MODE_MQTT, UPLOAD_MODE_NONE):
+            print(f"⚠️ Unknown map upload mode '{upload_mode}', falling back to '{UPLOAD_MODE_SCP}'")
+            upload_mode = UPLOAD_MODE_SCP
+        self.upload_mode = upload_mode
+        if MAP_PROCESSING not in PIPELINES:
+            print(f"⚠️ Unknown map processing '{MAP_PROCESSING}', falling back to 'fast'")
+        self.process_image = PIPELINES.get(MAP_PROCESSING, PIPELINES["fast"])
+        # The map is published at half the screen resolution, so capturing above 0.5 buys nothing.
+        self.capture_scale = min(max(MAP_SCREENSHOT_SCALE, 0.5), 1.0)
+        self.capture_quality = MAP_SCREENSHOT_QUALITY
+        self.scp_uploader = ScpUploader(MAP_UPLOAD_TARGET, MAP_UPLOAD_SSH_KEY_PATH, MAP_UPLOAD_SSH_KNOWN_HOSTS_PATH)
+        self.sftp_uploader = SftpUploader(MAP_UPLOAD_TARGET, MAP_UPLOAD_SSH_KEY_PATH, MAP_UPLOAD_SSH_KNOWN_HOSTS_PATH)
+        # Processing and upload run here so the device worker is free once the screenshot is taken.
+        self.pipeline = FrameWorker(self.process_frame, maxsize=MAP_PIPELINE_QUEUE_SIZE, name=f"map-{image_name}")
 
     def set_status_entity(self, entity):
         self.map_status_entity = entity
 
+    def set_image_entity(self, entity):
+        self.map_image_entity = entity
+
+    def set_unchanged_entity(self, entity):
+        self.map_unchanged_entity = entity
+
     def map_screenshot(self):
         self.navigator.navigate_to("Robot")
 
         self.dismiss_warnings_and_log()
         self.center_map()
 
-        img = self.device.screenshot()
-        w, h = img.size
-        img = img.resize((w // 2, h // 2), Image.LANCZOS)
-        w, h = img.size
-        img = img.crop((0, int(h * 0.09), w, int(h * 0.55))).convert("RGBA")
-        ImageDraw.floodfill(img, xy=(0, -1), value=(255, 255, 255, 0), thresh=25)
-        img.save("adb_ecovacs/Map_cropped.png")
-        print("Map screenshot saved.")
-        if MAP_UPLOAD_TARGET:
-            try:
-                scp_cmd = ["scp", "-o", "StrictHostKeyChecking=accept-new"]
-                key_path_raw = MAP_UPLOAD_SSH_KEY_PATH
-                if key_path_raw:
-                    key_path = Path(key_path_raw)
-                    if key_path.is_file():
-                        scp_cmd += ["-i", key_path_raw, "-o", "IdentitiesOnly=yes"]
-                        known_hosts_path = MAP_UPLOAD_SSH_KNOWN_HOSTS_PATH
-                        if known_hosts_path:
-                            kh_file = Path(known_hosts_path)
-                            if kh_file.is_file():
-                                scp_cmd += ["-o", f"UserKnownHostsFile={known_hosts_path}"]
-                scp_cmd += ["adb_ecovacs/Map_cropped.png", MAP_UPLOAD_TARGET]
-                subprocess.run(scp_cmd, check=True)
-                print("File successfully copied to Home Assistant.")
-            except FileNotFoundError:
-                print("Warning: scp binary not available; install OpenSSH client or skip map uploads.")
-            except subprocess.CalledProcessError as exc:
-                print("Error during SCP:", exc)
-        else:
-            print("Map upload target not configured; skipping map transfer.")
+        self.pipeline.submit(self.device.screenshot(self.capture_scale, self.capture_quality))
         self._update_map_status()
 
-    def _update_map_status(self):
-        self.device.refresh_tree()
+    def process_frame(self, img):
+        """Resize/crop/mask, then encode and upload unless unchanged (runs on the pipeline thread)."""
+        img = self.process_image(img, self.capture_scale)
+        thumb = self.change_detector.thumbnail(img)
+        if self.change_detector.is_unchanged(thumb):
+            count = self.change_detector.unchanged_count
+            print(f"🟰 Map unchanged since last upload; skipping encode/upload ({count} skipped).")
+            if self.map_unchanged_entity is not None:
+                self.map_unchanged_entity.publish_state(count)
+            self.scheduler.note_frame(changed=False)
+        else:
+            data = self.encode_png(img)
+            print(f"Map screenshot encoded ({len(data)} bytes).")
+            if self.publish_map(data):
+                self.change_detector.mark_uploaded(thumb)
+            self.scheduler.note_frame(changed=True)
+
+    @staticmethod
+    def encode_png(img) -> bytes:
+        """Encode the processed map in memory (no temp file)."""
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG", compress_level=MAP_PNG_COMPRESS_LEVEL, optimize=MAP_PNG_OPTIMIZE)
+        return buffer.getvalue()
+
+    def publish_map(self, data: bytes) -> bool:
+        """Send the encoded map to the configured target; True if it was delivered."""
+        if self.upload_mode == UPLOAD_MODE_MQTT:
+            if self.map_image_entity is None:
+                print("⚠️ Map image entity not initialized; skipping MQTT image publish")
+                return False
+            self.map_image_entity.publish_image(data)
+            print("📤 Map image published via MQTT.")
+            return True
+        if self.upload_mode == UPLOAD_MODE_SCP:
+            return self.scp_uploader.upload(data, self.image_path)
+        if self.upload_mode == UPLOAD_MODE_SFTP:
+            return self.sftp_uploader.upload(data, Path(self.image_path).name)
+        print("Map upload disabled; skipping map transfer.")
+        return False
+
+    def _update_map_status(self, fresh: bool = True):
+        """Read and publish the robot status; ``fresh=False`` reuses a dump the caller just took."""
+        if fresh:
+            self.device.refresh_tree()
         status_text = ""
         for grandchild in self.device.get_tree().findall(
                 ".//node[@class='android.view.View'][@index='1']"
@@ -96,28 +168,64 @@ class MapManager:
         status_text = status_text.strip()
         print("Status:", status_text)
         self.last_map_status = status_text
+        self.scheduler.note_status(status_text)
         if self.map_status_entity is not None:
-            self.map_status_entity.publish_state(status_text)
-            print(f"📤 MQTT map status -> {status_text}")
+            if self.map_status_entity.publish_state(status_text):
+                print(f"📤 MQTT map status -> {status_text}")
         else:
             print("⚠️ Map status entity not initialized; skipping MQTT publish")
         self.device.clear_tree()
 
+    def status_poll_task(self):
+        """
+        Status only: read the hierarchy if the phone already shows the Robot page.
+        Never wakes, unlocks or navigates; the tick is skipped otherwise.
+        """
+        if not self.navigator.on_page("Robot"):
+            print("⏭️ Status poll skipped: Robot page not on screen")
+            return
+        # on_page() has just dumped the hierarchy; read the status from that same dump.
+        self._update_map_status(fresh=False)
+
+    def queue_status_poll(self):
+        if self.pending_tasks is not None and self.pending_tasks() > 0:
+            # A command or map refresh is waiting and will read the status itself.
+            return
+        # Expires after one poll interval: a poll stuck behind slow commands is superseded by the next.
+        self.queue_task(
+            self.status_poll_task,
+            priority=PRIORITY_PERIODIC,
+            key=STATUS_POLL_TASK_KEY,
+            expires_in=self.status_poll_interval,
+        )
+
+    def start_status_poll(self):
+        """Poll the status every MAP_STATUS_POLL_INTERVAL seconds (0 disables)."""
+        if self.status_poll_interval <= 0 or self._status_poll_thread is not None:
+            return
+
+        def loop():
+            while not self._status_poll_stop.wait(self.status_poll_interval):
+                self.queue_status_poll()
+
+        self._status_poll_thread = threading.Thread(target=loop, name=f"status-poll-{Path(self.image_path).name}", daemon=True)
+        self._status_poll_thread.start()
+
     def map_refresh_task(self):
-        """Run a map screenshot and schedule the next refresh."""
-        self.map_screenshot()
-        self.schedule_map_refresh()
-
-    def schedule_map_refresh(self):
-        """Schedule the next map screenshot based on the current robot status."""
-        status = (self.last_map_status or "").strip().lower()
-        interval = MAP_REFRESH_INTERVAL_CLEANING if status.startswith("clean") else MAP_REFRESH_INTERVAL_IDLE
-        if self.map_refresh_timer is not None:
-            self.map_refresh_timer.cancel()
-        self.map_refresh_timer = threading.Timer(interval, lambda: self.queue_task(self.map_refresh_task))
-        self.map_refresh_timer.daemon = True
-        self.map_refresh_timer.start()
-        print(f"🗓️ Next map refresh scheduled in {interval} seconds (status: {self.last_map_status})")
+        """Periodic refresh; the scheduler picks the next time from the outcome."""
+        try:
+            self.map_screenshot()
+        finally:
+            # Only scheduler-initiated refreshes report back; post-command screenshots do not.
+            self.scheduler.refresh_done()
+
+    def queue_map_refresh(self):
+        """Queue a periodic map refresh; pending duplicates are coalesced."""
+        self.queue_task(self.map_refresh_task, priority=PRIORITY_PERIODIC, key=MAP_REFRESH_TASK_KEY)
+
+    def start_refresh_loop(self):
+        """Start adaptive periodic refreshes (the first one runs right away)."""
+        self.scheduler.start()
 
     def dismiss_warnings_and_log(self):
         cleaning_log = self.device.find_by_text("Cleaning completed. Tap to view the Log.")
@@ -1,7 +1,62 @@
 import json
 import re
+from collections import deque
 from dataclasses import dataclass
-from typing import Optional
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from mqtt_cache import PublishCache, shared_cache
+
+
+def _wait_acked(info, deadline: float) -> bool:
+    try:
+        info.wait_for_publish(max(deadline - monotonic(), 0.001))
+    except (RuntimeError, ValueError) as exc:
+        print(f"⚠️ Discovery publish not confirmed: {exc}")
+        return False
+    return info.is_published()
+
+
+def publish_bulk(
+    client,
+    messages: Iterable[Tuple[str, str]],
+    qos: int = 1,
+    window: int = 20,
+    timeout: float = 10.0,
+    publish_cache: Optional[PublishCache] = None,
+    force: bool = False,
+) -> Dict[str, float]:
+    """
+    Publish retained messages pipelined: at most ``window`` unacknowledged at a time,
+    then wait until all are acknowledged or ``timeout`` expires. Needs a running
+    network loop (``loop_start``). Only acknowledged messages are recorded in the
+    publish cache, so an unconfirmed one is sent again next time.
+    Returns sent/acked/skipped counts and elapsed seconds.
+    """
+    cache = publish_cache if publish_cache is not None else shared_cache
+    started = monotonic()
+    deadline = started + timeout
+    in_flight = deque()
+    sent = acked = skipped = 0
+
+    def settle(entry):
+        info, topic, payload = entry
+        if _wait_acked(info, deadline):
+            cache.remember(topic, payload)
+            return 1
+        return 0
+
+    for topic, payload in messages:
+        if not force and cache.is_duplicate(topic, payload):
+            skipped += 1
+            continue
+        while len(in_flight) >= max(1, window):
+            acked += settle(in_flight.popleft())
+        in_flight.append((client.publish(topic, payload, qos=qos, retain=True), topic, payload))
+        sent += 1
+    while in_flight:
+        acked += settle(in_flight.popleft())
+    return {"sent": sent, "acked": acked, "skipped": skipped, "elapsed": monotonic() - started}
 
 
 @dataclass
@@ -9,6 +64,7 @@ class MqttContext:
     client: Optional[object] = None
     device_info: Optional[dict] = None
     ha_prefix: Optional[str] = None
+    namespace: str = ""
 
 
 class MqttEntity:
@@ -20,23 +76,29 @@ class MqttEntity:
         entity_type: str,
         ha_prefix: str,
         enabled: bool = False,
+        namespace: str = "",
+        publish_cache: Optional[PublishCache] = None,
     ):
         self.client = client
+        # Shared by default so every entity/bridge in the process dedupes against one table.
+        self.publish_cache = publish_cache if publish_cache is not None else shared_cache
         self.device_info = device_info
         self.android_name = android_name
         self.safe_name = self._to_safe_name(android_name)
         self.name = self.android_name
         self.entity_type = entity_type.lower()
-        self.unique_id = self.safe_name
+        # A namespace keeps ids/topics of several robots apart; empty for a single robot.
+        self.unique_id = f"{self._to_safe_name(namespace)}_{self.safe_name}" if namespace else self.safe_name
         self.config_topic = f"{ha_prefix}/{self.entity_type}/{self.unique_id}/config"
         base_topic = f"{ha_prefix}/{self.unique_id}"
         self.state_topic = f"{base_topic}/state"
-        if self.entity_type == "switch":
+        if self.entity_type in ("switch", "text"):
             self.command_topic = f"{base_topic}/set"
         elif self.entity_type == "button":
             self.command_topic = f"{base_topic}/press"
         else:
             self.command_topic = None
+        self.image_topic = f"{base_topic}/image" if self.entity_type == "image" else None
         self.enabled = bool(enabled)
 
     @staticmethod
@@ -44,10 +106,7 @@ class MqttEntity:
         cleaned = re.sub(r"[^\w]+", "_", name.strip().lower())
         return cleaned.strip("_")
 
-    def publish_discovery(self):
-        if self.client is None:
-            return
-
+    def discovery_config(self) -> dict:
         cfg = {
             "name": self.android_name,
             "unique_id": self.unique_id,
@@ -69,15 +128,42 @@ class MqttEntity:
                     "payload_press": "PRESS",
                 }
             )
+        elif self.entity_type == "text":
+            cfg.update(
+                {
+                    "state_topic": self.state_topic,
+                    "command_topic": self.command_topic,
+                    "max": 255,
+                }
+            )
+        elif self.entity_type == "image":
+            cfg.update(
+                {
+                    "image_topic": self.image_topic,
+                    "content_type": "image/png",
+                }
+            )
         elif self.entity_type == "sensor":
             cfg.update(
                 {
                     "state_topic": self.state_topic,
                 }
             )
-        self.client.publish(self.config_topic, json.dumps(cfg), retain=True)
-        print(f"✅ Published {self.entity_type} discovery for {self.name}")
-        print(cfg)
+        return cfg
+
+    def discovery_messages(self) -> List[Tuple[str, str]]:
+        """Retained (topic, payload) pairs announcing this entity, incl. a switch's current state."""
+        messages = [(self.config_topic, json.dumps(self.discovery_config()))]
+        if self.entity_type == "switch":
+            messages.append((self.state_topic, "ON" if self.enabled else "OFF"))
+        return messages
+
+    def publish_discovery(self, force=False):
+        if self.client is None:
+            return
+        cfg = json.dumps(self.discovery_config())
+        if self.publish_cache.publish(self.client, self.config_topic, cfg, retain=True, force=force):
+            print(f"✅ Published {self.entity_type} discovery for {self.name}")
 
     def set_state(self, state, force=False):
         if self.entity_type != "switch" or self.client is None:
@@ -94,8 +180,8 @@ class MqttEntity:
             return
 
         self.enabled = desired
-        self.publish_state(payload)
-        print(f"💡 {self.name} state -> {payload}")
+        if self.publish_state(payload, force=force):
+            print(f"💡 {self.name} state -> {payload}")
 
     def press(self):
         if self.entity_type != "button" or self.client is None:
@@ -103,7 +189,13 @@ class MqttEntity:
         self.client.publish(self.command_topic, "PRESS")
         print(f"⚡ {self.name} button pressed")
 
-    def publish_state(self, payload, retain=True):
+    def publish_state(self, payload, retain=True, force=False) -> bool:
+        """Publish a state; identical retained payloads are skipped. True if it was sent."""
         if self.client is None:
-            return
-        self.client.publish(self.state_topic, str(payload), retain=retain)
+            return False
+        return self.publish_cache.publish(self.client, self.state_topic, str(payload), retain=retain, force=force)
+
+    def publish_image(self, data: bytes, retain=True, force=False) -> bool:
+        if self.entity_type != "image" or self.client is None:
+            return False
+        return self.publish_cache.publish(self.client, self.image_topic, bytearray(data), retain=retain, force=force)
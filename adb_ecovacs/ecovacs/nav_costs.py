@@ -0,0 +1,96 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_TRANSITION_LATENCY = 1.5
+LATENCY_SMOOTHING = 0.3
+
+
+class TransitionCostModel:
+    """Measured latency and success rate per navigation edge, persisted as JSON.
+
+    The cost of an edge is its expected time to a confirmed arrival: the smoothed
+    latency of successful hops divided by the (Laplace-smoothed) success rate.
+    Edges never measured cost ``default_latency``.
+    """
+
+    def __init__(self, path: Optional[str] = None, default_latency: float = DEFAULT_TRANSITION_LATENCY):
+        self.path = Path(path) if path else None
+        self.default_latency = default_latency
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.version = 0
+        self._dirty = False
+        self._load()
+
+    @staticmethod
+    def _key(src: str, dst: str) -> str:
+        return f"{src}->{dst}"
+
+    def _load(self):
+        if self.path is None or not self.path.is_file():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            print("Warning: could not load navigation costs:", exc)
+            return
+        if not isinstance(data, dict):
+            return
+        for key, value in data.items():
+            stats = self._coerce_stats(value)
+            if stats is None:
+                print(f"Warning: ignoring malformed navigation cost entry {key!r}")
+                continue
+            self.stats[key] = stats
+
+    def _default_stats(self) -> Dict[str, float]:
+        return {"attempts": 0, "successes": 0, "latency": self.default_latency}
+
+    def _coerce_stats(self, value) -> Optional[Dict[str, float]]:
+        """Merge a loaded entry over the defaults; None if it is not usable."""
+        if not isinstance(value, dict):
+            return None
+        stats = self._default_stats()
+        try:
+            for field in stats:
+                if field in value:
+                    stats[field] = float(value[field]) if field == "latency" else int(value[field])
+        except (TypeError, ValueError):
+            return None
+        if stats["attempts"] < 0 or stats["successes"] < 0 or stats["latency"] < 0:
+            return None
+        stats["successes"] = min(stats["successes"], stats["attempts"])
+        return stats
+
+    def record(self, src: str, dst: str, success: bool, latency: float):
+        stats = self.stats.setdefault(self._key(src, dst), self._default_stats())
+        stats["attempts"] += 1
+        if success:
+            stats["successes"] += 1
+            if stats["successes"] == 1:
+                stats["latency"] = latency
+            else:
+                stats["latency"] += LATENCY_SMOOTHING * (latency - stats["latency"])
+        self.version += 1
+        self._dirty = True
+
+    def cost(self, src: str, dst: str) -> float:
+        stats = self.stats.get(self._key(src, dst))
+        if not stats:
+            return self.default_latency
+        success_rate = (stats["successes"] + 1) / (stats["attempts"] + 1)
+        return max(stats["latency"], 0.01) / success_rate
+
+    def save(self):
+        """Write the stats if they changed since the last save."""
+        if self.path is None or not self._dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(self.stats, indent=2, sort_keys=True), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as exc:
+            print("Warning: could not save navigation costs:", exc)
@@ -1,59 +1,122 @@
-from collections import deque, defaultdict
-from time import sleep
-from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+from collections import defaultdict
+from time import monotonic, perf_counter
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
 
 from .device import DeviceController
+from .nav_costs import TransitionCostModel
+from .page_classifier import DetectionMetrics, PageClassifier
+
+PAGE_DETECT_TIMEOUT = 10.0
+HOP_SETTLE_TIMEOUT = 5.0
+PAGE_STATE_TTL = 30.0
 
 
 class Navigator:
     """Page detection and navigation between app screens."""
 
-    def __init__(self, device: DeviceController, password: str):
+    def __init__(
+        self,
+        device: DeviceController,
+        password: str,
+        cost_model: Optional[TransitionCostModel] = None,
+        page_state_ttl: float = PAGE_STATE_TTL,
+    ):
         self.device = device
         self.password = password
+        self.page_state_ttl = page_state_ttl
+        self._last_page: Optional[str] = None
+        self._last_page_at = 0.0
+        self._last_page_epoch = -1
+        self.cost_model = cost_model if cost_model is not None else TransitionCostModel()
+        self.classifier = PageClassifier()
+        self.detection_metrics = DetectionMetrics()
+        self._features: Optional[FrozenSet[str]] = None
+        self._features_version = -1
         self.page_detectors = self._build_page_detectors()
         self.nav_graph = self._build_nav_graph()
+        self._routes: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        self._routes_version = -1
+        self._compute_routes()
 
     # --------------------------
     # Page Detection
     # --------------------------
     def _build_page_detectors(self) -> Dict[str, Callable[[], bool]]:
-        def in_robot():
-            return self.device.find_by_text("Corridor", contains=True) is not None and self.device.find_by_text("Suction Power") is None and (
-                self.device.find_by_text("Start") is not None
-                or self.device.find_by_text("Pause") is not None
-                or self.device.find_by_text("End") is not None
-            )
-
-        def in_robot_settings():
-            return self.device.find_by_text("Corridor", contains=True) is not None and self.device.find_by_text("Suction Power") is not None and (
-                self.device.find_by_text("Start") is not None
-                or self.device.find_by_text("Pause") is not None
-                or self.device.find_by_text("End") is not None
-            )
-
-        def in_station():
-            return self.device.find_by_text("Corridor", contains=True) is not None and not in_robot() and not in_robot_settings()
-
-        return {
-            "ScreenOff": lambda: not self.device.device.info.get("screenOn"),
-            "Lock": lambda: self.device.find_by_desc("Entsperren") is not None,
-            "Desktop": lambda: self.device.find_by_desc("Nova-Suche") is not None,
-            "Main": lambda: self.device.find_by_desc("Enter") is not None,
-            "Scenario": lambda: self.device.find_by_text("Scenario Clean") is not None
-            and self.device.find_by_text("Nora") is not None,
-            "Robot": in_robot,
-            "RobotSettings": in_robot_settings,
-            "Station": in_station,
-            "StationAdvanced": self._in_station_advanced,
-            "Warning": lambda: self.device.find_by_text("Ignore") is not None
-            and self.device.find_by_text("View") is not None,
-        }
-
-    def _in_station_advanced(self):
-        for text in ["Mop Wash Settings", "Auto-Empty settings", "Hot Air Drying Settings"]:
-            if self.device.find_by_text(text) is not None:
-                return True
+        detectors: Dict[str, Callable[[], bool]] = {"ScreenOff": self._screen_off}
+        for rule in self.classifier.rules:
+            detectors[rule.name] = lambda rule=rule: rule.matches(self.page_features())
+        return detectors
+
+    def _screen_off(self) -> bool:
+        return not self.device.device.info.get("screenOn")
+
+    def page_features(self) -> FrozenSet[str]:
+        """Page signature features of the current dump, memoized per tree version."""
+        index = self.device.get_index()
+        version = self.device.tree_version
+        if self._features_version != version or self._features is None:
+            self._features = self.classifier.extract(index)
+            self._features_version = version
+        return self._features
+
+    def classify_current_page(self) -> Optional[str]:
+        """Classify the cached dump without retries; None when no rule matches."""
+        if self._screen_off():
+            return "ScreenOff"
+        return self.classifier.classify(self.page_features())
+
+    # --------------------------
+    # Page state tracking
+    # --------------------------
+    def _remember_page(self, page: str):
+        if page in self.classifier.rules_by_name:
+            self._last_page = page
+            self._last_page_at = monotonic()
+            self._last_page_epoch = self.device.navigation_epoch
+        else:
+            self.forget_page()
+
+    def forget_page(self):
+        self._last_page = None
+
+    def known_page(self) -> Optional[str]:
+        """Last confirmed page, unless it expired or an interaction (click, swipe, key press, wake) happened since."""
+        if self._last_page is None:
+            return None
+        if self.device.navigation_epoch != self._last_page_epoch or monotonic() - self._last_page_at > self.page_state_ttl:
+            self._last_page = None
+        return self._last_page
+
+    def _verify_known_page(self) -> Optional[str]:
+        """
+        Check only the last confirmed page's signature, without a screenOn RPC.
+        Every interaction bumps the navigation epoch, so a page that is still known
+        was not left through this controller; the cached dump is used when there is
+        one and the device is only dumped if the tree was cleared since. Matching a
+        cached dump does not extend the TTL, which bounds how long a user touching
+        the phone can go unnoticed. Returns None on mismatch (caller falls back).
+        """
+        page = self.known_page()
+        if page is None:
+            return None
+        fresh = not self.device.has_tree()
+        if self.classifier.rules_by_name[page].matches(self.page_features()):
+            if fresh:
+                self._last_page_at = monotonic()
+            return page
+        self.forget_page()
+        return None
+
+    def on_page(self, page: str) -> bool:
+        """True if the screen is on and a fresh dump shows ``page``; never navigates."""
+        if self._screen_off():
+            self.forget_page()
+            return False
+        self.device.refresh_tree()
+        if self.classifier.rules_by_name[page].matches(self.page_features()):
+            self._remember_page(page)
+            return True
         return False
 
     def in_robot(self):
@@ -93,6 +156,8 @@ class Navigator:
 
     def _lock_to_desktop(self):
         self.device.swipe(0.5, 0.8, 0.5, 0.5, 0.1)
+        if self.password:
+            self.device.wait_for(lambda: self.device.find_by_text(self.password[0]) is not None, timeout=2.0, fresh=False)
         for ch in self.password:
             self.device.click_elem(self.device.find_by_text(ch))
 
@@ -107,43 +172,94 @@ class Navigator:
         self.device.clear_tree()
 
     def detect_current_page(self) -> str:
-        pages = self.page_detectors
-        for _ in range(10):
-            for name, func in pages.items():
-                if func():
-                    print("Current page:", name)
-                    return name
-            sleep(1)
-            print("Retrying page detection...")
-            self.device.refresh_tree()
-        return "None"
+        started = perf_counter()
+        name = self._verify_known_page()
+        if name is not None:
+            elapsed = self.detection_metrics.record(name, started)
+            print(f"Current page: {name} (verified, {elapsed * 1000:.0f} ms)")
+            return name
+        name = self.device.wait_for(self.classify_current_page, timeout=PAGE_DETECT_TIMEOUT, fresh=False)
+        if name is None:
+            self.detection_metrics.record("None", started)
+            print("Page detection timed out")
+            return "None"
+        elapsed = self.detection_metrics.record(name, started)
+        print(f"Current page: {name} ({elapsed * 1000:.0f} ms)")
+        self._remember_page(name)
+        return name
+
+    def wait_for_page(self, page: str, timeout: float = HOP_SETTLE_TIMEOUT) -> bool:
+        """Return True as soon as ``page`` is detected, False once ``timeout`` expires."""
+        if self.device.wait_for(lambda: self.classify_current_page() == page, timeout=timeout, fresh=False):
+            self._remember_page(page)
+            return True
+        return False
+
+    def _compute_routes(self):
+        """All-pairs cheapest routes (Dijkstra per source) under the current edge costs."""
+        nodes = set(self.nav_graph)
+        for neighbors in list(self.nav_graph.values()):
+            nodes.update(neighbors)
+        routes = {}
+        for source in nodes:
+            best = {source: 0.0}
+            heap = [(0.0, 0, source, ())]
+            counter = 1
+            while heap:
+                cost, _, current, path = heapq.heappop(heap)
+                if cost > best.get(current, float("inf")):
+                    continue
+                routes[(source, current)] = list(path)
+                for neighbor in self.nav_graph.get(current, {}):
+                    next_cost = cost + self.cost_model.cost(current, neighbor)
+                    if next_cost < best.get(neighbor, float("inf")):
+                        best[neighbor] = next_cost
+                        heapq.heappush(heap, (next_cost, counter, neighbor, path + ((current, neighbor),)))
+                        counter += 1
+        self._routes = routes
+        self._routes_version = self.cost_model.version
 
     def find_path(self, start: str, goal: str) -> Optional[List[Tuple[str, str]]]:
-        queue = deque([(start, [])])
-        visited = set()
-        while queue:
-            current, path = queue.popleft()
-            if current == goal:
-                return path
-            visited.add(current)
-            for neighbor in self.nav_graph.get(current, {}):
-                if neighbor not in visited:
-                    queue.append((neighbor, path + [(current, neighbor)]))
-        return None
+        if self._routes_version != self.cost_model.version:
+            self._compute_routes()
+        route = self._routes.get((start, goal))
+        return list(route) if route is not None else None
 
     def navigate_to(self, target_page: str):
+        try:
+            self._navigate(target_page)
+        finally:
+            self.cost_model.save()
+
+    def _navigate(self, target_page: str):
+        current = self.detect_current_page()
         for _ in range(10):
-            current = self.detect_current_page()
             if current == target_page:
                 print("already at ", target_page)
                 return
             path = self.find_path(current, target_page)
             if not path:
+                print(f"⚠️ No route from {current} to {target_page}")
+                self.device.flush_debug_dumps(f"navigate_{target_page}")
                 return
             for src, dst in path:
                 print(f"Navigating {src} -> {dst}")
+                started = perf_counter()
                 self.nav_graph[src][dst]()
-                if self.detect_current_page() == dst:
-                    print(f"Arrived at {dst}")
+                if dst == "None":
+                    # Pseudo page (e.g. after dismissing a warning): re-plan from what is shown.
+                    current = self.detect_current_page()
+                    break
+                arrived = self.wait_for_page(dst)
+                self.cost_model.record(src, dst, arrived, perf_counter() - started)
+                if not arrived:
+                    print(f"Hop {src} -> {dst} not confirmed; re-detecting")
+                    self.forget_page()
+                    current = self.detect_current_page()
                     break
-                break
+                print(f"Arrived at {dst}")
+                current = dst
+        if current == target_page:
+            return
+        print(f"⚠️ Could not reach {target_page}")
+        self.device.flush_debug_dumps(f"navigate_{target_page}")
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from .tree_index import TreeIndex
+
+
+def text_is(value: str) -> str:
+    return f"text={value}"
+
+
+def text_has(value: str) -> str:
+    return f"text~{value}"
+
+
+def desc_is(value: str) -> str:
+    return f"desc={value}"
+
+
+@dataclass(frozen=True)
+class PageRule:
+    """Signature of one app page expressed over extracted features."""
+
+    name: str
+    all_of: Tuple[str, ...] = ()
+    any_of: Tuple[str, ...] = ()
+    none_of: Tuple[str, ...] = ()
+
+    def matches(self, features: FrozenSet[str]) -> bool:
+        if any(f not in features for f in self.all_of):
+            return False
+        if self.any_of and not any(f in features for f in self.any_of):
+            return False
+        return not any(f in features for f in self.none_of)
+
+    def features(self) -> Iterable[str]:
+        return self.all_of + self.any_of + self.none_of
+
+
+_CONTROLS = (text_is("Start"), text_is("Pause"), text_is("End"))
+
+# Evaluated in order; the first match wins.
+PAGE_RULES: Tuple[PageRule, ...] = (
+    PageRule("Lock", all_of=(desc_is("Entsperren"),)),
+    PageRule("Desktop", all_of=(desc_is("Nova-Suche"),)),
+    PageRule("Main", all_of=(desc_is("Enter"),)),
+    PageRule("Scenario", all_of=(text_is("Scenario Clean"), text_is("Nora"))),
+    PageRule("Robot", all_of=(text_has("Corridor"),), any_of=_CONTROLS, none_of=(text_is("Suction Power"),)),
+    PageRule("RobotSettings", all_of=(text_has("Corridor"), text_is("Suction Power")), any_of=_CONTROLS),
+    PageRule("Station", all_of=(text_has("Corridor"),), none_of=_CONTROLS),
+    PageRule(
+        "StationAdvanced",
+        any_of=(text_is("Mop Wash Settings"), text_is("Auto-Empty settings"), text_is("Hot Air Drying Settings")),
+    ),
+    PageRule("Warning", all_of=(text_is("Ignore"), text_is("View"))),
+)
+
+
+class PageClassifier:
+    """Extract all page signature features in one pass, then evaluate every rule."""
+
+    def __init__(self, rules: Tuple[PageRule, ...] = PAGE_RULES):
+        self.rules = rules
+        self.rules_by_name = {rule.name: rule for rule in rules}
+        wanted = {f for rule in rules for f in rule.features()}
+        self._text_exact = {f[5:] for f in wanted if f.startswith("text=")}
+        self._text_contains = tuple(f[5:] for f in wanted if f.startswith("text~"))
+        self._desc_exact = {f[5:] for f in wanted if f.startswith("desc=")}
+
+    def extract(self, index: TreeIndex) -> FrozenSet[str]:
+        """Single pass over the distinct text/content-desc values of a dump."""
+        features = set()
+        for value in index.by_text:
+            if not value:
+                continue
+            if value in self._text_exact:
+                features.add(text_is(value))
+            for needle in self._text_contains:
+                if needle in value:
+                    features.add(text_has(needle))
+        for value in index.by_desc:
+            if value in self._desc_exact:
+                features.add(desc_is(value))
+        return frozenset(features)
+
+    def classify(self, features: FrozenSet[str]) -> Optional[str]:
+        for rule in self.rules:
+            if rule.matches(features):
+                return rule.name
+        return None
+
+
+class DetectionMetrics:
+    """Per-page detection latency (count / total / max, in seconds)."""
+
+    def __init__(self):
+        self.samples: Dict[str, Dict[str, float]] = {}
+
+    def record(self, page: str, started: float) -> float:
+        elapsed = perf_counter() - started
+        stats = self.samples.setdefault(page, {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        return elapsed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            page: {
+                "count": stats["count"],
+                "avg_ms": 1000 * stats["total"] / stats["count"],
+                "max_ms": 1000 * stats["max"],
+            }
+            for page, stats in self.samples.items()
+        }
@@ -1,30 +1,63 @@
+import json
 import re
-from time import sleep
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 from .device import DeviceController
+from .entity_cache import EntityInventory
 from .navigation import Navigator
 from .mqtt_entities import MqttEntity, MqttContext
 
+ROOM_TOGGLE_SETTLE_TIMEOUT = 2.0
+ROOM_BATCH_SETTLE_TIMEOUT = 3.0
+MAP_CONTAINER_XPATH = ".//*[@resource-id='3d-map-out-div-9527']"
+
+_ICON_PREFIX_RE = re.compile(r"^[^A-Za-z0-9]+\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class RoomSnapshot(NamedTuple):
+    """Room data derived once from one parsed tree."""
+
+    tree: object
+    found: bool
+    parent_map: dict
+    rooms: List[Tuple[str, bool, object]]
+    by_name: Dict[str, Tuple[str, bool, object]]
+
 
 class RoomManager:
     """Handle room parsing and MQTT state sync."""
 
-    def __init__(self, device: DeviceController, navigator: Navigator, mqtt_context: MqttContext):
+    def __init__(
+        self,
+        device: DeviceController,
+        navigator: Navigator,
+        mqtt_context: MqttContext,
+        inventory: Optional[EntityInventory] = None,
+    ):
         self.device = device
         self.navigator = navigator
         self.mqtt_context = mqtt_context
+        self.inventory = inventory if inventory is not None else EntityInventory()
+        self._snapshot: Optional[RoomSnapshot] = None
+        # Called with each room entity discovered after startup (e.g. to route its commands).
+        self.on_entity_added: Optional[Callable[[MqttEntity], None]] = None
+        self._normalized_names: Dict[str, str] = {}
 
     @staticmethod
     def _clean_room_text(raw_text: str) -> str:
         """Strip icon glyphs and whitespace from the front of a room label."""
         if not raw_text:
             return ""
-        return re.sub(r"^[^A-Za-z0-9]+\s*", "", raw_text).strip()
+        return _ICON_PREFIX_RE.sub("", raw_text).strip()
 
     def _normalize_room_name(self, name: str) -> str:
-        cleaned = self._clean_room_text(name).replace("_", " ")
-        return re.sub(r"\s+", " ", cleaned).strip().lower()
+        normalized = self._normalized_names.get(name)
+        if normalized is None:
+            cleaned = self._clean_room_text(name).replace("_", " ")
+            normalized = _WHITESPACE_RE.sub(" ", cleaned).strip().lower()
+            self._normalized_names[name] = normalized
+        return normalized
 
     def _is_room_selected(self, btn, parent_map) -> bool:
         """Detect selection badge/flags near a room button."""
@@ -54,45 +87,68 @@ class RoomManager:
                 return True
         return _index_selected(btn) or _flag_selected(btn)
 
+    def _room_snapshot(self, tree) -> RoomSnapshot:
+        """
+        Parent map, room list and normalized-name index for ``tree``, built once per
+        parsed tree (DeviceController reuses the same tree object while dumps are unchanged).
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.tree is tree:
+            return snapshot
+
+        parent = tree.find(MAP_CONTAINER_XPATH)
+        if parent is None:
+            snapshot = RoomSnapshot(tree, False, {}, [], {})
+        else:
+            parent_map = {child: node for node in parent.iter() for child in node}
+            rooms = []
+            by_name = {}
+            for btn in parent.findall(".//*[@class='android.widget.Button']"):
+                raw_text = btn.get("text", "") or ""
+                android_name = self._clean_room_text(raw_text)
+                if not android_name:
+                    continue
+                room = (android_name, self._is_room_selected(btn, parent_map), btn)
+                rooms.append(room)
+                by_name.setdefault(self._normalize_room_name(android_name), room)
+            snapshot = RoomSnapshot(tree, True, parent_map, rooms, by_name)
+        self._snapshot = snapshot
+        return snapshot
+
     def _get_room_buttons_with_state(self, tree):
         """Return tuples of (android_name, enabled, button_node)."""
-        parent = tree.find(".//*[@resource-id='3d-map-out-div-9527']")
-        if parent is None:
-            return []
-
-        parent_map = {child: parent for parent in parent.iter() for child in parent}
-        rooms = []
-        for btn in parent.findall(".//*[@class='android.widget.Button']"):
-            raw_text = btn.get("text", "") or ""
-            android_name = self._clean_room_text(raw_text)
-            if not android_name:
-                continue
-            enabled = self._is_room_selected(btn, parent_map)
-            rooms.append((android_name, enabled, btn))
-        return rooms
+        return self._room_snapshot(tree).rooms
 
     def _log_room_debug(self, room_name, tree):
         """Print debug info for a given room if present in the tree."""
-        normalized = self._normalize_room_name(room_name)
-        parent = tree.find(".//*[@resource-id='3d-map-out-div-9527']")
-        if parent is None:
+        snapshot = self._room_snapshot(tree)
+        if not snapshot.found:
             print("🛑 No map parent found while debugging room state.")
             return
-        parent_map = {child: parent for parent in parent.iter() for child in parent}
-        for android_name, _, btn in self._get_room_buttons_with_state(tree):
-            if self._normalize_room_name(android_name) != normalized:
-                continue
-            ancestor = parent_map.get(btn)
-            print(
-                f"🧭 Debug room '{android_name}': btn(index={btn.attrib.get('index')}, "
-                f"selected={btn.attrib.get('selected')}, checked={btn.attrib.get('checked')}, "
-                f"bounds={btn.attrib.get('bounds')}), "
-                f"parent(index={ancestor.attrib.get('index') if ancestor is not None else None}, "
-                f"selected={ancestor.attrib.get('selected') if ancestor is not None else None}, "
-                f"checked={ancestor.attrib.get('checked') if ancestor is not None else None})"
-            )
+        room = snapshot.by_name.get(self._normalize_room_name(room_name))
+        if room is None:
+            print(f"🛑 Room '{room_name}' not found in debug scan.")
             return
-        print(f"🛑 Room '{room_name}' not found in debug scan.")
+        android_name, _, btn = room
+        ancestor = snapshot.parent_map.get(btn)
+        print(
+            f"🧭 Debug room '{android_name}': btn(index={btn.attrib.get('index')}, "
+            f"selected={btn.attrib.get('selected')}, checked={btn.attrib.get('checked')}, "
+            f"bounds={btn.attrib.get('bounds')}), "
+            f"parent(index={ancestor.attrib.get('index') if ancestor is not None else None}, "
+            f"selected={ancestor.attrib.get('selected') if ancestor is not None else None}, "
+            f"checked={ancestor.attrib.get('checked') if ancestor is not None else None})"
+        )
+
+    def _room_entity(self, name: str, enabled: bool) -> MqttEntity:
+        ctx = self.mqtt_context
+        if None in (ctx.client, ctx.device_info, ctx.ha_prefix):
+            raise RuntimeError("MQTT entity context is not initialized; call set_mqtt_entity_context first.")
+        return MqttEntity(ctx.client, ctx.device_info, name, "switch", ctx.ha_prefix, enabled, namespace=ctx.namespace)
+
+    def cached_entities(self) -> List[MqttEntity]:
+        """Room switches from the last saved inventory, without touching the device."""
+        return [self._room_entity(name, enabled) for name, enabled in self.inventory.rooms]
 
     def refresh_room_state(self, entities: Optional[List[MqttEntity]] = None):
         self.navigator.navigate_to("Robot")
@@ -103,24 +159,26 @@ class RoomManager:
             print("⚠️ No map found for RefreshRoomState()")
             return [] if entities is None else entities
 
-        ctx_client = self.mqtt_context.client
-        ctx_device = self.mqtt_context.device_info
-        ctx_prefix = self.mqtt_context.ha_prefix
-        if None in (ctx_client, ctx_device, ctx_prefix):
-            raise RuntimeError("MQTT entity context is not initialized; call set_mqtt_entity_context first.")
+        self.inventory.update([(name, enabled) for name, enabled, _ in button_states])
 
         if entities is None:
-            return [MqttEntity(ctx_client, ctx_device, name, "switch", ctx_prefix, enabled) for name, enabled, _ in button_states]
+            return [self._room_entity(name, enabled) for name, enabled, _ in button_states]
 
         existing = {e.android_name: e for e in entities if e.entity_type == "switch"}
+        live_names = {name for name, _, _ in button_states}
+        for name in existing:
+            if name not in live_names:
+                print(f"⚠️ Room '{name}' is no longer shown on the map; keeping its entity")
         for name, enabled, _ in button_states:
             entity = existing.get(name)
             if entity is None:
-                new_entity = MqttEntity(ctx_client, ctx_device, name, "switch", ctx_prefix, enabled)
+                new_entity = self._room_entity(name, enabled)
                 entities.append(new_entity)
                 new_entity.publish_discovery()
                 new_entity.set_state(enabled, force=True)
                 print(f"➕ Added new room entity for {name}")
+                if self.on_entity_added is not None:
+                    self.on_entity_added(new_entity)
                 continue
             if entity.enabled != enabled:
                 entity.set_state(enabled)
@@ -128,24 +186,116 @@ class RoomManager:
                 entity.enabled = enabled
         return entities
 
+    def _match_room(self, snapshot: RoomSnapshot, room_name):
+        """Find the (android_name, enabled, button) tuple for a room: exact, then contains-match."""
+        normalized = self._normalize_room_name(room_name)
+        room = snapshot.by_name.get(normalized)
+        if room is not None:
+            return room
+        for name, room in snapshot.by_name.items():
+            if normalized in name:
+                print(f"ℹ️ Using contains-match on '{room[0]}'")
+                return room
+        return None
+
+    def _resolve_known_room(self, name: str, lookup: Dict[str, str]) -> str:
+        """Map a payload room name onto a known android_name: exact, then contains-match."""
+        normalized = self._normalize_room_name(name)
+        if normalized in lookup:
+            return lookup[normalized]
+        for known_normalized, known in lookup.items():
+            if normalized and normalized in known_normalized:
+                return known
+        return name
+
+    def parse_room_selection(self, payload: str, known_rooms: Iterable[str]) -> Dict[str, bool]:
+        """
+        Parse a JSON room set into {room: enabled}, keyed by known room names where possible.
+        Accepts an object ({"Kitchen": true, "Bath": "OFF"}) for explicit states, or a
+        list (["Kitchen", "Bath"]) meaning exactly those rooms on and every other known room off.
+        """
+        known_rooms = list(known_rooms)
+        data = json.loads(payload)
+        if isinstance(data, list):
+            desired = {name: False for name in known_rooms}
+            explicit = {str(name): True for name in data}
+        elif isinstance(data, dict):
+            desired = {}
+            explicit = {}
+            for name, value in data.items():
+                if isinstance(value, str):
+                    explicit[str(name)] = value.strip().upper() in ("ON", "TRUE", "1")
+                else:
+                    explicit[str(name)] = bool(value)
+        else:
+            raise ValueError("room selection must be a JSON object or list")
+        lookup = {self._normalize_room_name(name): name for name in known_rooms}
+        # Explicit entries are applied last so they override the list-mode "off" defaults.
+        for name, state in explicit.items():
+            desired[self._resolve_known_room(name, lookup)] = state
+        return desired
+
+    def set_rooms(self, desired: Dict[str, bool], timeout: float = ROOM_BATCH_SETTLE_TIMEOUT) -> bool:
+        """
+        Bring several rooms to the desired on/off states in one pass: diff against one
+        tree snapshot, click every button that needs to change, then verify all at once.
+        Returns True when every requested room is visible and in its desired state.
+        """
+        self.navigator.navigate_to("Robot")
+        self.device.refresh_tree()
+        snapshot = self._room_snapshot(self.device.get_tree())
+        # One entry per matched button; later entries win, so each button is clicked at most once.
+        resolved: Dict[str, Tuple[bool, Tuple[str, bool, object]]] = {}
+        missing = []
+        for room_name, state in desired.items():
+            match = self._match_room(snapshot, room_name)
+            if match is None:
+                missing.append(room_name)
+                continue
+            resolved[match[0]] = (bool(state), match)
+        wanted = {self._normalize_room_name(name): state for name, (state, _) in resolved.items()}
+        to_click = [match for state, match in resolved.values() if match[1] != state]
+        if missing:
+            print(f"⚠️ Rooms not found on screen: {missing}")
+        if not to_click:
+            print("ℹ️ Room selection already matches; nothing to click")
+            return not missing
+
+        for android_name, enabled, btn in to_click:
+            print(f"➡️ Clicking room '{android_name}' (was enabled={enabled})")
+            self.device.click_elem(btn)
+
+        def _all_reached():
+            current = self._room_snapshot(self.device.get_tree()).by_name
+            return all(name in current and current[name][1] == state for name, state in wanted.items())
+
+        reached = bool(self.device.wait_for(_all_reached, timeout=timeout))
+        if reached:
+            print(f"✅ Room selection applied ({len(to_click)} click(s))")
+        else:
+            print(f"⚠️ Room selection not confirmed within {timeout:.1f}s")
+        return reached and not missing
+
+    def selected_rooms(self) -> Optional[List[str]]:
+        """Names of the rooms currently selected on screen, or None if the map is not visible."""
+        self.device.refresh_tree()
+        snapshot = self._room_snapshot(self.device.get_tree())
+        if not snapshot.rooms:
+            return None
+        return sorted(name for name, enabled, _ in snapshot.rooms if enabled)
+
     def enable_room(self, room_name):
         self.navigator.navigate_to("Robot")
         self.device.refresh_tree()
         tree = self.device.get_tree()
         target = None
         normalized = self._normalize_room_name(room_name)
-        rooms = self._get_room_buttons_with_state(tree)
-        print(f"🔎 enbl_room searching for '{room_name}' (normalized '{normalized}'). Rooms visible: {[n for n, _, _ in rooms]}")
-        for android_name, enabled, btn in rooms:
-            if self._normalize_room_name(android_name) == normalized:
-                target = (android_name, enabled, btn)
-                break
-        if target is None:
-            for android_name, enabled, btn in rooms:
-                if normalized in self._normalize_room_name(android_name):
-                    print(f"ℹ️ Using contains-match on '{android_name}'")
-                    target = (android_name, enabled, btn)
-                    break
+        snapshot = self._room_snapshot(tree)
+        print(
+            f"🔎 enbl_room searching for '{room_name}' (normalized '{normalized}'). "
+            f"Rooms visible: {[n for n, _, _ in snapshot.rooms]}"
+        )
+        target = self._match_room(snapshot, room_name)
         if target is None and "_" in room_name:
             fallback = room_name.replace("_", " ")
             target = self.device.find_by_text(fallback, contains=True)
@@ -156,12 +306,18 @@ class RoomManager:
             android_name, enabled, btn = target
             print(f"➡️ Clicking room '{android_name}' (was enabled={enabled}, bounds={btn.attrib.get('bounds')})")
             self.device.click_elem(btn)
+            print(f"🏠 Clicked on room: {room_name}")
+            # Return as soon as the button flips instead of sleeping a fixed amount.
+            self.device.wait_for(
+                lambda: self.get_room_enabled_state(room_name) not in (None, enabled),
+                timeout=ROOM_TOGGLE_SETTLE_TIMEOUT,
+                fresh=False,
+            )
         else:
             print(f"➡️ Clicking fallback element for '{room_name}'")
             self.device.click_elem(target)
-        print(f"🏠 Clicked on room: {room_name}")
-        sleep(0.3)
-        self.device.refresh_tree()
+            print(f"🏠 Clicked on room: {room_name}")
+            self.device.refresh_tree()
         post_state = self.get_room_enabled_state(room_name)
         print(f"🔁 Post-click state for '{room_name}': {post_state}")
 
@@ -171,28 +327,33 @@ class RoomManager:
         Returns True/False, or None if the room is not visible.
         """
         tree = self.device.get_tree()
-        for android_name, enabled, _ in self._get_room_buttons_with_state(tree):
-            if self._normalize_room_name(android_name) == self._normalize_room_name(room_name):
-                return enabled
-        return None
+        room = self._room_snapshot(tree).by_name.get(self._normalize_room_name(room_name))
+        return None if room is None else room[1]
 
     def wait_for_room_state(self, room_name, desired_state, retries=3, delay=0.5):
         """
         Poll the UI until the room reflects the desired enabled state.
+        ``retries * delay`` is the overall deadline; polling backs off adaptively.
         Returns True on success, False on timeout.
         """
-        for attempt in range(1, retries + 1):
-            self.device.refresh_tree()
+        timeout = retries * delay
+        attempts = 0
+
+        def _reached():
+            nonlocal attempts
+            attempts += 1
             state = self.get_room_enabled_state(room_name)
-            if state is None:
-                print(f"⏳ Room '{room_name}' not visible (attempt {attempt}/{retries})")
-                self._log_room_debug(room_name, self.device.get_tree())
-            elif state == desired_state:
-                print(f"✅ Room '{room_name}' reached state {desired_state} after {attempt} attempt(s)")
+            if state == desired_state:
                 return True
+            if state is None:
+                print(f"⏳ Room '{room_name}' not visible (attempt {attempts})")
             else:
-                print(f"⏳ Room '{room_name}' state {state} != desired {desired_state} (attempt {attempt}/{retries})")
-                self._log_room_debug(room_name, self.device.get_tree())
-            sleep(delay)
-        print(f"⚠️ Room '{room_name}' did not reach desired state {desired_state} after {retries} attempts")
+                print(f"⏳ Room '{room_name}' state {state} != desired {desired_state} (attempt {attempts})")
+            self._log_room_debug(room_name, self.device.get_tree())
+            return False
+
+        if self.device.wait_for(_reached, timeout=timeout, fresh=False):
+            print(f"✅ Room '{room_name}' reached state {desired_state} after {attempts} attempt(s)")
+            return True
+        print(f"⚠️ Room '{room_name}' did not reach desired state {desired_state} within {timeout:.1f}s ({attempts} attempts)")
         return False
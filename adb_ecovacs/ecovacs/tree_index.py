@@ -0,0 +1,63 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+class TreeIndex:
+    """One-pass lookup tables over a UI hierarchy dump.
+
+    Exact lookups are plain dict hits. Substring lookups scan only the distinct
+    non-empty values (a few hundred instead of thousands of nodes) and are memoized
+    for the lifetime of the dump.
+    """
+
+    def __init__(self, root):
+        self.by_text: Dict[str, object] = {}
+        self.by_desc: Dict[str, object] = {}
+        self.by_resource_id: Dict[str, List[object]] = defaultdict(list)
+        self.by_class_index: Dict[Tuple[str, str], List[object]] = defaultdict(list)
+        self.first_node = None
+        self._contains_cache: Dict[Tuple[str, str], Optional[object]] = {}
+
+        for elem in root.iter("node"):
+            attrib = elem.attrib
+            if self.first_node is None:
+                self.first_node = elem
+            self.by_text.setdefault(attrib.get("text", ""), elem)
+            self.by_desc.setdefault(attrib.get("content-desc", ""), elem)
+            resource_id = attrib.get("resource-id")
+            if resource_id:
+                self.by_resource_id[resource_id].append(elem)
+            self.by_class_index[(attrib.get("class", ""), attrib.get("index", ""))].append(elem)
+
+    def find_text(self, text: str, contains: bool = False):
+        if not contains:
+            return self.by_text.get(text)
+        return self._find_contains("text", self.by_text, text)
+
+    def find_desc(self, desc: str, contains: bool = False):
+        if not contains:
+            return self.by_desc.get(desc)
+        return self._find_contains("content-desc", self.by_desc, desc)
+
+    def find_resource_id(self, resource_id: str):
+        nodes = self.by_resource_id.get(resource_id)
+        return nodes[0] if nodes else None
+
+    def find_class_index(self, cls: str, index: str) -> List[object]:
+        return self.by_class_index.get((cls, str(index)), [])
+
+    def _find_contains(self, attr: str, values: Dict[str, object], needle: str):
+        if not needle:
+            return self.first_node
+        key = (attr, needle)
+        if key in self._contains_cache:
+            return self._contains_cache[key]
+        # Dict order is first-occurrence order, so the first hit is also the first
+        # matching node in document order.
+        match = None
+        for value, elem in values.items():
+            if needle in value:
+                match = elem
+                break
+        self._contains_cache[key] = match
+        return match
@@ -0,0 +1,68 @@
+import base64
+import io
+
+from PIL import Image
+
+from ecovacs.device import DeviceController
+
+
+def encoded_jpeg(size=(50, 100)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (1, 2, 3)).save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class FakeJsonRpc:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def takeScreenshot(self, scale, quality):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class FakeDevice:
+    def __init__(self, responses):
+        self.jsonrpc = FakeJsonRpc(responses)
+        self.full_captures = 0
+
+    def screenshot(self):
+        self.full_captures += 1
+        return Image.new("RGB", (100, 200))
+
+
+def test_reduced_capture_uses_agent_frame():
+    device = FakeDevice([encoded_jpeg()])
+    controller = DeviceController(device=device)
+
+    img = controller.screenshot(scale=0.5, quality=80)
+
+    assert img.size == (50, 100)
+    assert device.full_captures == 0
+
+
+def test_transient_failure_falls_back_once_and_retries():
+    device = FakeDevice([TimeoutError("read timed out"), "", encoded_jpeg()])
+    controller = DeviceController(device=device)
+
+    assert controller.screenshot(scale=0.5, quality=80).size == (50, 100)
+    assert controller.screenshot(scale=0.5, quality=80).size == (50, 100)
+    assert controller.screenshot(scale=0.5, quality=80).size == (50, 100)
+
+    assert device.jsonrpc.calls == 3
+    assert device.full_captures == 2
+
+
+def test_method_not_found_disables_reduced_capture():
+    device = FakeDevice([RuntimeError("JSONRPCError: code=-32601, Method not found")])
+    controller = DeviceController(device=device)
+
+    controller.screenshot(scale=0.5, quality=80)
+    controller.screenshot(scale=0.5, quality=80)
+
+    assert device.jsonrpc.calls == 1
+    assert device.full_captures == 2
@@ -0,0 +1,69 @@
+from PIL import Image
+
+from ecovacs import map_change
+from ecovacs.map_change import MapChangeDetector
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_detector(monkeypatch, resync_interval=0.0):
+    clock = FakeClock()
+    monkeypatch.setattr(map_change, "monotonic", clock)
+    detector = MapChangeDetector(threshold=0.002, resync_interval=resync_interval)
+    return detector, clock
+
+
+def frame(color=128):
+    return Image.new("RGB", (200, 200), (color, color, color))
+
+
+def test_identical_frame_is_unchanged_after_upload(monkeypatch):
+    detector, _ = make_detector(monkeypatch)
+    thumb = detector.thumbnail(frame())
+    assert not detector.is_unchanged(thumb)
+    detector.mark_uploaded(thumb)
+
+    assert detector.is_unchanged(detector.thumbnail(frame()))
+    assert detector.unchanged_count == 1
+    assert not detector.is_unchanged(detector.thumbnail(frame(color=10)))
+
+
+def test_reset_forces_next_upload(monkeypatch):
+    detector, _ = make_detector(monkeypatch)
+    thumb = detector.thumbnail(frame())
+    detector.mark_uploaded(thumb)
+
+    detector.reset()
+
+    assert not detector.is_unchanged(thumb)
+    assert detector.unchanged_count == 0
+
+
+def test_unchanged_frame_is_uploaded_once_resync_is_due(monkeypatch):
+    detector, clock = make_detector(monkeypatch, resync_interval=300.0)
+    thumb = detector.thumbnail(frame())
+    detector.mark_uploaded(thumb)
+
+    clock.now += 299.0
+    assert detector.is_unchanged(thumb)
+
+    clock.now += 1.0
+    assert not detector.is_unchanged(thumb)
+
+    detector.mark_uploaded(thumb)
+    assert detector.is_unchanged(thumb)
+
+
+def test_resync_disabled_by_default(monkeypatch):
+    detector, clock = make_detector(monkeypatch)
+    thumb = detector.thumbnail(frame())
+    detector.mark_uploaded(thumb)
+
+    clock.now += 10 ** 6
+    assert detector.is_unchanged(thumb)
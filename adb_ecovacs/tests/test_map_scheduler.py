@@ -0,0 +1,159 @@
+import pytest
+
+from ecovacs import map_scheduler
+from ecovacs.map_scheduler import ACTIVE_MAX_INTERVAL, RefreshScheduler, is_active_status
+
+
+@pytest.mark.parametrize(
+    "status",
+    ["Cleaning", "Cleaning 12m²", "Returning to charge", "Mopping", "Vacuuming", "Relocating", "Going to Kitchen"],
+)
+def test_active_statuses(status):
+    assert is_active_status(status)
+
+
+@pytest.mark.parametrize(
+    "status",
+    [
+        "Cleaning completed",
+        "Cleaning completed. Tap to view the Log.",
+        "Cleaning paused",
+        "Cleaning finished",
+        "Clean water tank low on water or not installed",
+        "Charging",
+        "Idle",
+        "",
+        None,
+    ],
+)
+def test_inactive_statuses(status):
+    assert not is_active_status(status)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(map_scheduler, "monotonic", clock)
+    # No jitter: every delay is exactly the current interval.
+    monkeypatch.setattr(map_scheduler.random, "uniform", lambda a, b: 1.0)
+    return clock
+
+
+def make_scheduler(clock, active_interval=5.0, idle_interval=900.0, max_staleness=3600.0):
+    """Scheduler whose first refresh is due now, as after ``start()``, but without the thread."""
+    scheduler = RefreshScheduler(
+        lambda: None, active_interval=active_interval, idle_interval=idle_interval, max_staleness=max_staleness
+    )
+    scheduler._due = clock.now
+    return scheduler
+
+
+def run_once(scheduler, clock):
+    """Claim the due refresh as the loop would, then report it finished."""
+    assert scheduler._take_due(clock.now)
+    scheduler.refresh_done()
+
+
+def test_unchanged_frames_back_off_up_to_active_cap(clock):
+    scheduler = make_scheduler(clock)
+    scheduler.note_status("Cleaning")
+    run_once(scheduler, clock)
+
+    intervals = []
+    for _ in range(10):
+        scheduler.note_frame(changed=False)
+        intervals.append(scheduler.interval)
+
+    assert intervals[:4] == [10.0, 20.0, 40.0, ACTIVE_MAX_INTERVAL]
+    assert max(intervals) == ACTIVE_MAX_INTERVAL
+    assert scheduler._due == clock.now + ACTIVE_MAX_INTERVAL
+
+    scheduler.note_frame(changed=True)
+    assert scheduler.interval == 5.0
+
+
+def test_due_is_clamped_to_max_staleness(clock):
+    scheduler = make_scheduler(clock, idle_interval=900.0, max_staleness=300.0)
+    run_once(scheduler, clock)
+    assert scheduler._due == clock.now + 300.0
+
+    with scheduler._cond:
+        scheduler._set_due(clock.now + 5000.0)
+    assert scheduler._due == clock.now + 300.0
+
+    with scheduler._cond:
+        scheduler._set_due(clock.now + 10.0)
+    assert scheduler._due == clock.now + 10.0
+
+
+def test_refresh_done_reschedules_from_last_run(clock):
+    scheduler = make_scheduler(clock, idle_interval=900.0)
+    assert scheduler._take_due(clock.now)
+
+    clock.now += 42.0
+    scheduler.refresh_done()
+
+    assert scheduler._last_run == 1042.0
+    assert scheduler._due == 1042.0 + 900.0
+    assert not scheduler._take_due(1042.0 + 899.0)
+    assert scheduler._take_due(1042.0 + 900.0)
+
+
+def test_frames_reported_while_in_flight_do_not_reschedule(clock):
+    scheduler = make_scheduler(clock)
+    run_once(scheduler, clock)
+    clock.now += 900.0
+    assert scheduler._take_due(clock.now)
+
+    scheduler.note_frame(changed=False)
+
+    assert scheduler._due is None
+
+
+def test_watchdog_reclaims_refresh_that_never_reports_back(clock):
+    scheduler = make_scheduler(clock, max_staleness=600.0)
+    assert scheduler._take_due(clock.now)
+
+    clock.now += 599.0
+    assert not scheduler._take_due(clock.now)
+    assert scheduler._wait_timeout(clock.now) == 1.0
+
+    clock.now += 1.0
+    assert scheduler._take_due(clock.now)
+    assert scheduler._in_flight
+
+
+def test_status_change_makes_refresh_due_now(clock):
+    scheduler = make_scheduler(clock)
+    scheduler.note_status("Charging")
+    run_once(scheduler, clock)
+    assert scheduler._due == clock.now + 900.0
+
+    clock.now += 30.0
+    scheduler.note_status("Charging")
+    assert not scheduler._take_due(clock.now)
+
+    scheduler.note_status("Cleaning")
+    assert scheduler.interval == 5.0
+    assert scheduler._take_due(clock.now)
+
+
+def test_boost_falls_back_to_active_interval(clock):
+    scheduler = make_scheduler(clock)
+    scheduler.note_status("Charging")
+    run_once(scheduler, clock)
+
+    clock.now += 30.0
+    scheduler.boost("command")
+
+    assert scheduler.interval == 5.0
+    assert scheduler._due == 1005.0
+    assert scheduler._take_due(clock.now)
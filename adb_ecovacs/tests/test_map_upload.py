@@ -0,0 +1,175 @@
+import stat
+import types
+
+import pytest
+
+from ecovacs import map_upload
+from ecovacs.map_upload import SftpUploader
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeSftp:
+    def __init__(self, files, failures):
+        self.files = files
+        self.failures = failures
+
+    def stat(self, path):
+        if path.rstrip("/") == "/config/www":
+            return types.SimpleNamespace(st_mode=stat.S_IFDIR)
+        raise OSError("no such file")
+
+    def putfo(self, fileobj, path):
+        if self.failures:
+            self.failures.pop()
+            raise OSError("broken pipe")
+        self.files[path] = fileobj.read()
+
+    def posix_rename(self, src, dst):
+        self.files[dst] = self.files.pop(src)
+
+
+class FakeClient:
+    def __init__(self, files, failures):
+        self.transport = FakeTransport()
+        self.sftp = FakeSftp(files, failures)
+
+    def open_sftp(self):
+        return self.sftp
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.transport.active = False
+
+
+@pytest.fixture
+def remote():
+    files = {}
+    failures = []
+    clients = []
+
+    def factory():
+        client = FakeClient(files, failures)
+        clients.append(client)
+        return client
+
+    return types.SimpleNamespace(files=files, failures=failures, clients=clients, factory=factory)
+
+
+def test_upload_writes_temp_file_then_renames(remote):
+    uploader = SftpUploader("root@ha:/config/www", client_factory=remote.factory)
+
+    assert uploader.upload(b"png", "Map_cropped.png")
+    assert remote.files == {"/config/www/Map_cropped.png": b"png"}
+
+
+def test_session_is_reused_between_uploads(remote):
+    uploader = SftpUploader("root@ha:/config/www/", client_factory=remote.factory)
+
+    assert uploader.upload(b"one", "map.png")
+    assert uploader.upload(b"two", "map.png")
+    assert len(remote.clients) == 1
+    assert remote.files["/config/www/map.png"] == b"two"
+
+
+def test_failed_upload_reconnects_and_retries_once(remote):
+    uploader = SftpUploader("root@ha:/config/www", client_factory=remote.factory)
+    remote.failures.append(True)
+
+    assert uploader.upload(b"png", "map.png")
+    assert len(remote.clients) == 2
+    assert not remote.clients[0].transport.active
+    assert remote.files == {"/config/www/map.png": b"png"}
+
+
+def test_upload_gives_up_after_second_failure(remote):
+    uploader = SftpUploader("root@ha:/config/www", client_factory=remote.factory)
+    remote.failures.extend([True, True])
+
+    assert not uploader.upload(b"png", "map.png")
+    assert remote.files == {}
+
+
+def test_file_target_is_used_as_is(remote):
+    uploader = SftpUploader("ha:/config/www/custom.png", client_factory=remote.factory)
+
+    assert uploader.upload(b"png", "ignored.png")
+    assert remote.files == {"/config/www/custom.png": b"png"}
+
+
+class FakeHostKeys:
+    def __init__(self, known):
+        self.known = known
+
+    def lookup(self, host):
+        return {"ssh-ed25519": "key"} if host in self.known else None
+
+
+class FakeSshClient:
+    instances = []
+
+    def __init__(self):
+        self.known = set()
+        self.policy = None
+        self.saved_to = None
+        FakeSshClient.instances.append(self)
+
+    def load_host_keys(self, path):
+        with open(path, encoding="utf-8") as fh:
+            self.known.update(line.split()[0] for line in fh if line.strip())
+
+    def get_host_keys(self):
+        return FakeHostKeys(self.known)
+
+    def set_missing_host_key_policy(self, policy):
+        self.policy = policy
+
+    def connect(self, host, **kwargs):
+        self.known.add(host)
+
+    def save_host_keys(self, path):
+        self.saved_to = path
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.writelines(f"{host} ssh-ed25519 key\n" for host in sorted(self.known))
+
+
+@pytest.fixture
+def fake_paramiko(monkeypatch):
+    FakeSshClient.instances = []
+    module = types.SimpleNamespace(
+        SSHClient=FakeSshClient,
+        AutoAddPolicy=lambda: "auto-add",
+        RejectPolicy=lambda: "reject",
+    )
+    monkeypatch.setattr(map_upload, "paramiko", module)
+    return module
+
+
+def test_first_contact_accepts_and_saves_host_key(fake_paramiko, tmp_path):
+    known_hosts = tmp_path / "ssh" / "known_hosts"
+    uploader = SftpUploader("root@ha:/config/www", known_hosts_path=str(known_hosts))
+
+    uploader._connect()
+
+    client = FakeSshClient.instances[-1]
+    assert client.policy == "auto-add"
+    assert client.saved_to == str(known_hosts)
+    assert known_hosts.read_text(encoding="utf-8").startswith("ha ")
+
+
+def test_known_host_rejects_unknown_keys(fake_paramiko, tmp_path):
+    known_hosts = tmp_path / "known_hosts"
+    known_hosts.write_text("ha ssh-ed25519 key\n", encoding="utf-8")
+    uploader = SftpUploader("root@ha:/config/www", known_hosts_path=str(known_hosts))
+
+    uploader._connect()
+
+    assert FakeSshClient.instances[-1].policy == "reject"
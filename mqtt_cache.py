@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from settings import MQTT_RESYNC_INTERVAL
+
+
+def _digest(payload) -> bytes:
+    if payload is None:
+        data = b""
+    elif isinstance(payload, (bytes, bytearray)):
+        data = bytes(payload)
+    else:
+        data = str(payload).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class PublishCache:
+    """
+    Last payload per topic, used to drop retained publishes that would not change anything.
+
+    Only retained messages are cached: the broker already holds that exact value,
+    so republishing it just costs traffic and HA recorder writes. Non-retained
+    messages are events and always go out. With ``resync_interval`` > 0 an
+    identical payload is let through again once that many seconds have passed.
+    """
+
+    def __init__(self, resync_interval: float = 0.0):
+        self.resync_interval = resync_interval
+        self._entries: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def is_duplicate(self, topic: str, payload) -> bool:
+        """True if ``payload`` is what was last recorded for ``topic`` and no resync is due."""
+        digest = _digest(payload)
+        with self._lock:
+            cached = self._entries.get(topic)
+            return (
+                cached is not None
+                and cached[0] == digest
+                and (self.resync_interval <= 0 or monotonic() - cached[1] < self.resync_interval)
+            )
+
+    def remember(self, topic: str, payload):
+        """Record ``payload`` as delivered on ``topic``."""
+        with self._lock:
+            self._entries[topic] = (_digest(payload), monotonic())
+
+    def should_publish(self, topic: str, payload, retain: bool = True, force: bool = False) -> bool:
+        if not retain:
+            return True
+        if not force and self.is_duplicate(topic, payload):
+            with self._lock:
+                self.suppressed += 1
+            return False
+        self.remember(topic, payload)
+        return True
+
+    def publish(self, client, topic: str, payload, retain: bool = True, force: bool = False, **kwargs) -> bool:
+        """Publish through ``client`` unless it is a duplicate; True if it was sent."""
+        if client is None or not self.should_publish(topic, payload, retain, force):
+            return False
+        client.publish(topic, payload, retain=retain, **kwargs)
+        return True
+
+    def invalidate(self, topic: Optional[str] = None):
+        """Forget one topic (or all), e.g. after a reconnect to a broker that may have lost state."""
+        with self._lock:
+            if topic is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(topic, None)
+
+
+shared_cache = PublishCache(MQTT_RESYNC_INTERVAL)
@@ -39,6 +39,26 @@ def _int_env(name: str) -> int:
         raise ValueError(f"Environment variable {name} must be an integer, got: {raw}") from exc
 
 
+def _int_env_default(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return int(raw)
+    except ValueError as exc:
+        raise ValueError(f"Environment variable {name} must be an integer, got: {raw}") from exc
+
+
+def _float_env_default(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return float(raw)
+    except ValueError as exc:
+        raise ValueError(f"Environment variable {name} must be a number, got: {raw}") from exc
+
+
 def _str_env(name: str, default: Optional[str] = None) -> Optional[str]:
     value = os.getenv(name)
     if value is not None:
@@ -73,13 +93,51 @@ MQTT_BROKER = _required_env("MQTT_BROKER")
 MQTT_USER = _required_env("MQTT_USER")
 MQTT_PASSWORD = _required_env("MQTT_PASSWORD")
 HA_DISCOVERY_PREFIX = _str_env("HA_DISCOVERY_PREFIX", "homeassistant")
+# Identical retained MQTT payloads are not republished; >0 lets one through again after this many seconds.
+MQTT_RESYNC_INTERVAL = _float_env_default("MQTT_RESYNC_INTERVAL", 0.0)
+# Startup discovery: QoS, max unacknowledged publishes in flight, and seconds to wait for all acks.
+MQTT_DISCOVERY_QOS = _int_env_default("MQTT_DISCOVERY_QOS", 1)
+MQTT_DISCOVERY_WINDOW = _int_env_default("MQTT_DISCOVERY_WINDOW", 20)
+MQTT_DISCOVERY_TIMEOUT = _float_env_default("MQTT_DISCOVERY_TIMEOUT", 10.0)
 DEVICE_NAME = _required_env("DEVICE_NAME")
+# Optional: comma-separated adb serials to bridge several phones/robots from one container.
+ANDROID_SERIALS = [serial.strip() for serial in (_str_env("ANDROID_SERIALS", "") or "").split(",") if serial.strip()]
+# Optional: comma-separated display names matching ANDROID_SERIALS (defaults to "DEVICE_NAME <serial>").
+DEVICE_NAMES = [name.strip() for name in (_str_env("DEVICE_NAMES", "") or "").split(",") if name.strip()]
 ANDROID_PASSWORD = _required_env("ANDROID_PASSWORD")
 TELNET_HOST = _required_env("TELNET_HOST")
 TELNET_PORT = _int_env("TELNET_PORT")
 MAP_UPLOAD_TARGET = _str_env("MAP_UPLOAD_TARGET", f"{MQTT_BROKER}:/root/config/www/")
 MAP_UPLOAD_SSH_KEY_PATH = _str_env("MAP_UPLOAD_SSH_KEY_PATH", "/root/.ssh/id_adb_ecovacs")
 MAP_UPLOAD_SSH_KNOWN_HOSTS_PATH = _str_env("MAP_UPLOAD_SSH_KNOWN_HOSTS_PATH", "/root/.ssh/known_hosts")
+MAP_UPLOAD_MODE = (_str_env("MAP_UPLOAD_MODE", "scp") or "scp").strip().lower()
+MAP_PNG_COMPRESS_LEVEL = _int_env_default("MAP_PNG_COMPRESS_LEVEL", 6)
+# Fraction of map thumbnail cells that must change before a new map is uploaded (-1 disables).
+MAP_CHANGE_THRESHOLD = _float_env_default("MAP_CHANGE_THRESHOLD", 0.002)
+# Captured map frames waiting for processing/upload; older frames are dropped beyond this.
+MAP_PIPELINE_QUEUE_SIZE = _int_env_default("MAP_PIPELINE_QUEUE_SIZE", 2)
+MAP_PNG_OPTIMIZE = (_str_env("MAP_PNG_OPTIMIZE", "false") or "false").strip().lower() in ("1", "true", "yes", "on")
+# Map image pipeline: fast (crop, reduce(2), NumPy background mask) or legacy (LANCZOS + floodfill).
+MAP_PROCESSING = (_str_env("MAP_PROCESSING", "fast") or "fast").strip().lower()
+# Map capture size/encoding on the phone: 0.5 + JPEG quality < 100 pulls a quarter of the pixels over USB.
+# Use 1.0 and 100 for the previous full-resolution PNG capture.
+MAP_SCREENSHOT_SCALE = _float_env_default("MAP_SCREENSHOT_SCALE", 0.5)
+MAP_SCREENSHOT_QUALITY = _int_env_default("MAP_SCREENSHOT_QUALITY", 90)
+# Adaptive map refresh: interval while the robot moves / while idle, growing while the map is unchanged,
+# but never longer than MAP_REFRESH_MAX_STALENESS seconds between two maps.
+MAP_REFRESH_INTERVAL_ACTIVE = _float_env_default("MAP_REFRESH_INTERVAL_ACTIVE", 5.0)
+MAP_REFRESH_INTERVAL_IDLE = _float_env_default("MAP_REFRESH_INTERVAL_IDLE", 900.0)
+MAP_REFRESH_MAX_STALENESS = _float_env_default("MAP_REFRESH_MAX_STALENESS", 3600.0)
+# Seconds between status-only polls (hierarchy read, publishes "Map Status"); 0 disables.
+MAP_STATUS_POLL_INTERVAL = _float_env_default("MAP_STATUS_POLL_INTERVAL", 15.0)
+UI_DUMP_MODE = (_str_env("UI_DUMP_MODE", "on_failure") or "on_failure").strip().lower()
+UI_DUMP_HISTORY = _int_env_default("UI_DUMP_HISTORY", 5)
+UI_DUMP_DIR = _str_env("UI_DUMP_DIR", "adb_ecovacs/ui_dumps")
+POST_COMMAND_QUIET_WINDOW = _float_env_default("POST_COMMAND_QUIET_WINDOW", 1.5)
+# Last known rooms/switch states; lets a restart publish discovery before the phone is reachable.
+ENTITY_CACHE_PATH = _str_env("ENTITY_CACHE_PATH", "adb_ecovacs/entity_cache.json")
+NAV_COST_PATH = _str_env("NAV_COST_PATH", "adb_ecovacs/nav_costs.json")
+UI_TREE_PARSER = (_str_env("UI_TREE_PARSER", "etree") or "etree").strip().lower()
 
 if MAP_UPLOAD_SSH_KEY_PATH:
     _write_base64_env_to_file(
@@ -9,6 +9,7 @@ if str(ROOT_DIR) not in sys.path:
 
 import paho.mqtt.client as mqtt
 
+from mqtt_cache import shared_cache
 from settings import HA_DISCOVERY_PREFIX, MQTT_BROKER, MQTT_PASSWORD, MQTT_PORT, MQTT_USER
 
 SENSOR_NAME = "LMS Output"
@@ -29,6 +30,9 @@ DEVICE_INFO = {
 mqtt_client: Optional[mqtt.Client] = None
 EventLogger = Callable[[str], None]
 event_logger: Optional[EventLogger] = None
+# Last labels handed to the broker, re-sent after a reconnect.
+last_state_label: Optional[str] = None
+last_method_label: Optional[str] = None
 STATE_ICON_MAP = {"play": "▶", "pause": "⏸", "off": "⏹"}
 METHOD_ICON_MAP = {"LMS": "🎵", "BT": "🅱️", "AirPlay": "📡"}
 
@@ -39,11 +43,14 @@ def set_event_logger(logger: Optional[EventLogger]) -> None:
 
 
 def publish_state_label(label: str, value: Optional[int] = None) -> None:
+    global last_state_label
     if mqtt_client is None:
         print("⚠️ MQTT client not ready; skipping publish")
         return
 
-    mqtt_client.publish(STATE_TOPIC, label, retain=True)
+    last_state_label = label
+    if not shared_cache.publish(mqtt_client, STATE_TOPIC, label, retain=True):
+        return
     state_base = label.split(" - ", 1)[0]
     icon = STATE_ICON_MAP.get(state_base, "")
     message = f"📡 {icon} state -> {label}"
@@ -53,11 +60,14 @@ def publish_state_label(label: str, value: Optional[int] = None) -> None:
 
 
 def publish_method_label(label: str) -> None:
+    global last_method_label
     if mqtt_client is None:
         print("⚠️ MQTT client not ready; skipping publish")
         return
 
-    mqtt_client.publish(METHOD_STATE_TOPIC, label, retain=True)
+    last_method_label = label
+    if not shared_cache.publish(mqtt_client, METHOD_STATE_TOPIC, label, retain=True):
+        return
     icon = METHOD_ICON_MAP.get(label, "🎧")
     message = f"{icon} method -> {label}"
     print(message)
@@ -75,17 +85,30 @@ def publish_discovery():
         "device": DEVICE_INFO,
         "state_topic": STATE_TOPIC,
     }
-    mqtt_client.publish(CONFIG_TOPIC, json.dumps(cfg), retain=True)
+    shared_cache.publish(mqtt_client, CONFIG_TOPIC, json.dumps(cfg), retain=True)
     method_cfg = {
         "name": METHOD_SENSOR_NAME,
         "unique_id": METHOD_SENSOR_UNIQUE,
         "device": DEVICE_INFO,
         "state_topic": METHOD_STATE_TOPIC,
     }
-    mqtt_client.publish(METHOD_CONFIG_TOPIC, json.dumps(method_cfg), retain=True)
+    shared_cache.publish(mqtt_client, METHOD_CONFIG_TOPIC, json.dumps(method_cfg), retain=True)
     print(f"✅ Published MQTT discovery for {SENSOR_NAME} and {METHOD_SENSOR_NAME}")
 
 
+def on_connect(client, userdata, flags, rc, properties=None):
+    # The broker may have restarted without persistence; let every retained state go out again.
+    shared_cache.invalidate()
+    if mqtt_client is None:
+        return
+    publish_discovery()
+    # Retained states may be gone as well; send the current ones without logging a new event.
+    if last_state_label is not None:
+        shared_cache.publish(mqtt_client, STATE_TOPIC, last_state_label, retain=True)
+    if last_method_label is not None:
+        shared_cache.publish(mqtt_client, METHOD_STATE_TOPIC, last_method_label, retain=True)
+
+
 def init_mqtt():
     global mqtt_client
 
@@ -94,6 +117,7 @@ def init_mqtt():
 
     client = mqtt.Client()
     client.username_pw_set(MQTT_USER, MQTT_PASSWORD)
+    client.on_connect = on_connect
     try:
         client.connect(MQTT_BROKER, MQTT_PORT, 60)
         client.loop_start()